@@ -3,13 +3,10 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 import os
+import threading
+import time
+import uuid
 import streamlit as st
-import pdfkit  # ✅ For PDF generation using wkhtmltopdf
-
-# ✅ wkhtmltopdf path configuration (verified earlier)
-PDFKIT_CONFIG = pdfkit.configuration(
-    wkhtmltopdf=r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-)
 
 # Optional dotenv
 try:
@@ -21,21 +18,21 @@ except Exception:
 
 from auth import login, logout, login_ui
 from prompts import section_summary_prompts
-from pdf_processing import extract_text_from_pdf, preprocess_for_llm, chunk_document
-from vectorstore import create_vector_store
-from summarizer import summarize_all_sections
+from sessions import DONE, FAILED, get_ingestion_worker
+from pdf_export import cached_summary_pdf, get_summary_pdf
+from scheduler import iter_section_summaries
 
-# Translation & Audio modules
+# Translation & Audio modules (their backends are imported on first use)
 try:
     import translate as translate_module
-    _TRANSLATE_MODULE_AVAILABLE = True
+    _TRANSLATE_MODULE_AVAILABLE = translate_module.BACKEND_AVAILABLE
 except Exception:
     translate_module = None
     _TRANSLATE_MODULE_AVAILABLE = False
 
 try:
     import audio as audio_module
-    _AUDIO_MODULE_AVAILABLE = True
+    _AUDIO_MODULE_AVAILABLE = audio_module.BACKEND_AVAILABLE
 except Exception:
     audio_module = None
     _AUDIO_MODULE_AVAILABLE = False
@@ -47,70 +44,56 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 
 # ============ CONFIGURE LLM MODELS ============
+# Heavy libraries (langchain, chromadb, torch, Gemini/Groq SDKs) are imported
+# inside the stages that use them, so the login and terms pages stay fast.
+@st.cache_resource(show_spinner=False)
 def configure_genai():
-    """Configure Gemini and Groq LLMs."""
+    """Configure Gemini and Groq LLMs once per process."""
     import google.generativeai as genai
     from langchain_groq import ChatGroq
 
     genai.configure(api_key=GOOGLE_API_KEY)
     llm_model = genai.GenerativeModel("gemini-2.5-flash")
+    from settings import QUERY_GEN_MODEL
+
     query_gen_llm = ChatGroq(
         temperature=0,
         groq_api_key=GROQ_API_KEY,
-        model_name="llama-3.3-70b-versatile"
+        model_name=QUERY_GEN_MODEL
     )
     return llm_model, query_gen_llm
 
 
-# ============ PDF CREATION FUNCTION ============
-def create_pdf_pdfkit(summaries: dict, title: str = "Summaries") -> bytes:
-    """
-    Generate a clean, standard PDF using pdfkit (wkhtmltopdf backend).
-    No Unicode fonts or local file dependencies.
-    Safe for Windows systems without font setup.
-    """
-
-    html = f"""
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{
-                font-family: Arial, Helvetica, sans-serif;
-                padding: 30px;
-                background-color: #ffffff;
-            }}
-            h1 {{
-                text-align: center;
-                color: #2C3E50;
-                margin-bottom: 25px;
-            }}
-            h2 {{
-                color: #1A5276;
-                margin-top: 25px;
-            }}
-            p {{
-                font-size: 14px;
-                line-height: 1.6;
-                text-align: justify;
-                color: #2c3e50;
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>{title}</h1>
-    """
-
-    # Add sections and summaries
-    for section, text in summaries.items():
-        html += f"<h2>{section}</h2><p>{text}</p>"
-
-    html += "</body></html>"
-
-    # Generate the PDF safely (no file:// URLs)
-    pdf_bytes = pdfkit.from_string(html, False, configuration=PDFKIT_CONFIG)
-    return pdf_bytes
+@st.cache_resource(show_spinner=False)
+def start_model_warm_up():
+    """Load the embedding model in the background once per process."""
+    if os.getenv("ARS_WARMUP", "1") == "0":
+        return None
+
+    def warm_up():
+        try:
+            from vectorstore import get_embedding_engine
+            get_embedding_engine().warm_up()
+        except Exception:
+            pass  # The first upload will load (and report) it instead.
+
+    thread = threading.Thread(target=warm_up, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
 
+# ============ AUDIO PLAYBACK ============
+def render_section_audio(sections: dict, lang: str):
+    """Play each section as soon as its audio is ready, then the full narration."""
+    texts = [f"{sec}\n{txt}" for sec, txt in sections.items()]
+    paths = []
+    with st.spinner("Generating audio..."):
+        with st.expander("Section audio", expanded=True):
+            for section, path in zip(sections, audio_module.iter_section_audio(texts, lang=lang)):
+                st.caption(section)
+                st.audio(path)
+                paths.append(path)
+    st.audio(audio_module.concatenate_audio(paths, lang=lang))
 
 
 # ============ STREAMLIT PAGE SETUP ============
@@ -156,6 +139,8 @@ except Exception:
 if not st.session_state.get("authenticated", False):
     st.stop()
 
+start_model_warm_up()
+
 st.sidebar.title("User Menu")
 st.sidebar.markdown("<div style='height:60vh'></div>", unsafe_allow_html=True)
 if st.sidebar.button("Logout"):
@@ -189,27 +174,69 @@ if st.button("Back to Terms", key="back_to_terms"):
     st.rerun()
 
 if uploaded_pdf:
-    with open("temp.pdf", "wb") as f:
-        f.write(uploaded_pdf.read())
-
-    st.info("Extracting text from the document...")
-    pages = extract_text_from_pdf("temp.pdf")
-    for p in pages:
-        p["cleaned_text"] = preprocess_for_llm(p["text"])
-
-    chunks = chunk_document(pages)
-    st.success(f"✅ Processed {len(chunks)} chunks")
+    # Ingestion runs on a background worker; this rerun polls the job and
+    # reruns itself until it finishes. Ingestion is cached by content hash,
+    # so reruns and repeat uploads reuse the existing chunks and vector store.
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    worker = get_ingestion_worker()
+    upload_id = getattr(uploaded_pdf, "file_id", None) or f"{uploaded_pdf.name}:{uploaded_pdf.size}"
+    job = worker.submit(session_id, upload_id, uploaded_pdf.getvalue())
+    worker.wait(job, timeout=0.5)
+    if job.status == FAILED:
+        st.error(f"Ingestion failed: {job.error}")
+        st.stop()
+    if job.status != DONE:
+        st.progress(job.progress, text=job.message)
+        time.sleep(1.0)
+        st.rerun()
+
+    chunks, vectorstore, from_cache, section_pages, lexical_index = job.result
+    if from_cache:
+        st.success(f"✅ Loaded {len(chunks)} chunks from cache")
+    else:
+        st.success(f"✅ Processed {len(chunks)} chunks")
+    if section_pages:
+        with st.expander(f"Located {len(section_pages)} of {len(section_summary_prompts)} sections"):
+            for section, (first_page, last_page) in section_pages.items():
+                st.write(f"{section}: pages {first_page}–{last_page}")
+
+    from vectorstore import get_embedding_engine
+    with st.sidebar.expander("Embedding engine"):
+        st.json(get_embedding_engine().stats())
 
-    st.info("Creating Vector Store...")
     llm_model, query_gen_llm = configure_genai()
 
-    vectorstore = create_vector_store(chunks, "uploaded_report")
-    base_retriever = vectorstore.as_retriever(search_kwargs={"k": 20})
-
-    from langchain_classic.retrievers import MultiQueryRetriever
-    multi_query_retriever = MultiQueryRetriever.from_llm(
-        retriever=base_retriever, llm=query_gen_llm
+    retriever_modes = ["Multi-query (LLM expansion)", "Hybrid (BM25 + dense, offline)"]
+    retriever_mode = st.sidebar.selectbox(
+        "Retriever", retriever_modes, index=int(os.getenv("ARS_RETRIEVER", "multi_query") == "hybrid")
     )
+    if retriever_mode == retriever_modes[1]:
+        from hybrid_retrieval import HybridRetriever
+        multi_query_retriever = HybridRetriever(
+            vectorstore=vectorstore, lexical_index=lexical_index, k=20, section_pages=section_pages
+        )
+        retriever_provider = None
+    else:
+        # Query variants for the fixed section prompts are compiled once per
+        # prompts.py version; fall back to live LLM expansion if that fails.
+        # A failed compile is not retried on every rerun of this session.
+        from query_expansion import PrecompiledMultiQueryRetriever, get_or_compile_expansions
+        try:
+            if st.session_state.get("expansions_failed"):
+                raise RuntimeError("query expansion compile failed earlier in this session")
+            expansions = get_or_compile_expansions(query_gen_llm)
+            multi_query_retriever = PrecompiledMultiQueryRetriever(
+                vectorstore=vectorstore, expansions=expansions, k=20, section_pages=section_pages
+            )
+            retriever_provider = None
+        except Exception:
+            st.session_state["expansions_failed"] = True
+            from langchain_classic.retrievers import MultiQueryRetriever
+            retriever_provider = "groq"
+            base_retriever = vectorstore.as_retriever(search_kwargs={"k": 20})
+            multi_query_retriever = MultiQueryRetriever.from_llm(
+                retriever=base_retriever, llm=query_gen_llm
+            )
     st.success("Vector Store and Retriever ready!")
 
     # Session state
@@ -221,36 +248,60 @@ if uploaded_pdf:
         st.session_state["translated_lang_code"] = None
 
     # --- Generate Summaries ---
+    force_regenerate = st.checkbox("Force regenerate (ignore cached summaries)", key="force_regenerate")
     if st.button("🚀 Generate Summaries"):
+        # Render each section as soon as it completes; the placeholder is
+        # cleared afterwards and the ordered results are shown below.
+        live = st.empty()
+        summaries = {}
+        cached_sections = set()
         with st.spinner("Generating summaries..."):
-            summaries = summarize_all_sections(multi_query_retriever, llm_model)
-            st.session_state["summaries"] = summaries
-            st.session_state["translated_summaries"] = None
-            st.success("Summaries generated successfully!")
+            with live.container():
+                for section, summary, cached in iter_section_summaries(
+                    multi_query_retriever, llm_model,
+                    retriever_provider=retriever_provider, use_cache=not force_regenerate,
+                ):
+                    summaries[section] = summary
+                    if cached:
+                        cached_sections.add(section)
+                    st.subheader(section)
+                    st.write(summary)
+        live.empty()
+        st.session_state["summaries"] = {
+            section: summaries[section] for section in section_summary_prompts if section in summaries
+        }
+        st.session_state["cached_sections"] = cached_sections
+        st.session_state["translated_summaries"] = None
+        st.success("Summaries generated successfully!")
 
     summaries = st.session_state.get("summaries")
     if summaries:
         st.markdown("## 🧾 Generated Summaries")
+        cached_sections = st.session_state.get("cached_sections", set())
         for section, summary in summaries.items():
             st.subheader(section)
+            if section in cached_sections:
+                st.caption("⚡ Cached")
             st.write(summary)
 
-        # Download summaries as PDF
-        pdf_bytes = create_pdf_pdfkit(summaries, title="Generated Summaries")
-        st.download_button(
-            "📥 Download Generated Summaries (PDF)",
-            data=pdf_bytes,
-            file_name="generated_summaries.pdf",
-            mime="application/pdf",
-        )
+        # Download summaries as PDF. Rendering happens only when asked for;
+        # after that the cached bytes are reused on every rerun.
+        pdf_bytes = cached_summary_pdf(summaries, "Generated Summaries")
+        if pdf_bytes is None and st.button("📄 Prepare PDF"):
+            with st.spinner("Rendering PDF..."):
+                pdf_bytes = get_summary_pdf(summaries, title="Generated Summaries")
+        if pdf_bytes is not None:
+            st.download_button(
+                "📥 Download Generated Summaries (PDF)",
+                data=pdf_bytes,
+                file_name="generated_summaries.pdf",
+                mime="application/pdf",
+            )
 
         # English Audio
         if _AUDIO_MODULE_AVAILABLE:
             if st.button("🔊 Generate Audio (English)"):
-                with st.spinner("Generating audio..."):
-                    text = "\n\n".join([f"{sec}\n{txt}" for sec, txt in summaries.items()])
-                    audio_path = audio_module.generate_audio_from_text(text=text, lang="en")
-                    st.audio(audio_path)
+                render_section_audio(summaries, lang="en")
 
         # --- GLOBAL TRANSLATION ---
         if _TRANSLATE_MODULE_AVAILABLE:
@@ -272,10 +323,8 @@ if uploaded_pdf:
 
             if translate_all_btn:
                 dest_code = lang_map.get(dest_name)
-                translated_summaries = {}
                 with st.spinner("Translating summaries..."):
-                    for section, summary in summaries.items():
-                        translated_summaries[section] = translate_module.translate_text(summary, dest=dest_code)
+                    translated_summaries = translate_module.translate_batch(summaries, dest=dest_code)
                 st.session_state["translated_summaries"] = translated_summaries
                 st.session_state["translated_lang_code"] = dest_code
                 st.success("✅ Translation complete")
@@ -293,7 +342,26 @@ if uploaded_pdf:
 
         if _AUDIO_MODULE_AVAILABLE:
             if st.button("🔊 Generate Audio (Translated)"):
-                with st.spinner("Generating audio..."):
-                    all_text = "\n\n".join([f"{sec}\n{txt}" for sec, txt in translated_summaries.items()])
-                    audio_path = audio_module.generate_audio_from_text(text=all_text, lang=lang_code)
-                    st.audio(audio_path)
+                render_section_audio(translated_summaries, lang=lang_code)
+
+# --- PIPELINE METRICS (sidebar) ---
+# Rendered last so it includes spans recorded during this run.
+from metrics import registry as metrics_registry
+
+with st.sidebar.expander("📈 Pipeline metrics"):
+    stage_summary = metrics_registry.summary()
+    if stage_summary:
+        st.table({
+            stage: {
+                "count": s["count"],
+                "p50 (s)": s["p50"],
+                "p95 (s)": s["p95"],
+                "errors": s["errors"],
+                "retries": s["retries"],
+            }
+            for stage, s in sorted(stage_summary.items())
+        })
+    else:
+        st.caption("No stages recorded yet.")
+    st.download_button("Export JSON lines", metrics_registry.to_jsonl(), file_name="metrics.jsonl")
+    st.download_button("Export Prometheus", metrics_registry.to_prometheus(), file_name="metrics.prom")
@@ -1,20 +1,121 @@
 """
 Audio generation module using Google Text-to-Speech (gTTS)
 Generates MP3 audio files from given text and language code.
+
+Text is synthesized per section on a small thread pool. Each segment is
+cached on disk by (backend, text hash, language), so regenerating audio for
+unchanged summaries is instant, and segments are concatenated into the
+final MP3. Output paths are content-addressed, so concurrent users never
+overwrite each other's files. The cache is kept under ARS_AUDIO_CACHE_MB
+by dropping the least recently used files.
 """
 
+import hashlib
+import importlib.util
 import os
-from gtts import gTTS
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from metrics import span
+from settings import cache_dir, env_int, evict_files, touch
+
+# gTTS is imported on first use; this only records whether it is installed.
+BACKEND_AVAILABLE = importlib.util.find_spec("gtts") is not None
+
+_executor = ThreadPoolExecutor(max_workers=env_int("ARS_AUDIO_WORKERS", 4), thread_name_prefix="audio")
+
+
+def gtts_backend(text: str, lang: str, output_path: str):
+    """Default backend: synthesize text with gTTS into output_path."""
+    from gtts import gTTS
+
+    gTTS(text=text, lang=lang).save(output_path)
+
 
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _backend_id(backend: Optional[Callable]) -> str:
+    if backend is None:
+        return "gtts"
+    return f"{getattr(backend, '__module__', '')}.{getattr(backend, '__qualname__', type(backend).__qualname__)}"
+
+
+def evict_audio_cache(keep: Sequence[str] = ()):
+    """Trim the audio cache to ARS_AUDIO_CACHE_MB, never removing the paths in keep."""
+    evict_files(cache_dir("audio"), env_int("ARS_AUDIO_CACHE_MB", 512) * 1024 * 1024, keep)
+
+
+def _atomic_write(path: str, write: Callable[[str], None]):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def generate_audio_from_text(text: str, lang: str = "en") -> str:
+
+def synthesize_segment(text: str, lang: str = "en", backend: Optional[Callable] = None) -> str:
+    """Return the path of a cached MP3 for text, synthesizing it on a miss."""
+    digest = _text_hash(f"{_backend_id(backend)}\n{text}")
+    path = os.path.join(cache_dir("audio"), f"{digest}_{lang}.mp3")
+    if os.path.exists(path):
+        touch(path)
+    else:
+        try:
+            with span("tts", lang=lang, characters=len(text)):
+                _atomic_write(path, lambda tmp: (backend or gtts_backend)(text, lang, tmp))
+        except Exception as e:
+            raise RuntimeError(f"Audio generation failed: {e}")
+    return path
+
+
+def iter_section_audio(texts: Sequence[str], lang: str = "en", backend: Optional[Callable] = None) -> Iterator[str]:
+    """
+    Synthesize all sections in parallel and yield their paths in order.
+
+    The first path is yielded as soon as that section is ready, so playback
+    can start while later sections are still being produced.
+    """
+    texts = [t for t in texts if t.strip()]
+    if not texts:
+        raise ValueError("Text is empty. Cannot generate audio.")
+    futures = [_executor.submit(synthesize_segment, text, lang, backend) for text in texts]
+    for future in futures:
+        yield future.result()
+
+
+def concatenate_audio(paths: List[str], lang: str = "en") -> str:
+    """Join MP3 segments into one cached file (MP3 frames concatenate cleanly)."""
+    digest = _text_hash("|".join(os.path.basename(p) for p in paths))
+    output_path = os.path.join(cache_dir("audio"), f"combined_{digest}_{lang}.mp3")
+    if os.path.exists(output_path):
+        touch(output_path)
+    else:
+        def write(tmp_path):
+            with open(tmp_path, "wb") as out:
+                for path in paths:
+                    with open(path, "rb") as f:
+                        out.write(f.read())
+        _atomic_write(output_path, write)
+        evict_audio_cache(keep=[*paths, output_path])
+    return output_path
+
+
+def generate_audio_from_text(text: str, lang: str = "en", backend: Optional[Callable] = None) -> str:
     """
     Generate an audio file from text using gTTS and return file path.
 
     Args:
-        text (str): The text to convert to speech.
+        text (str): The text to convert to speech. Paragraphs (blank-line
+            separated) are synthesized in parallel and cached individually.
         lang (str): Language code for voice (default "en").
+        backend (callable): Optional replacement for gTTS, called as
+            backend(text, lang, output_path).
 
     Returns:
         str: Path to the generated audio file (MP3).
@@ -22,15 +123,5 @@ def generate_audio_from_text(text: str, lang: str = "en") -> str:
     if not text.strip():
         raise ValueError("Text is empty. Cannot generate audio.")
 
-    try:
-        # Create a temporary file
-        temp_dir = tempfile.gettempdir()
-        output_path = os.path.join(temp_dir, f"summary_audio_{lang}.mp3")
-
-        # Generate TTS audio
-        tts = gTTS(text=text, lang=lang)
-        tts.save(output_path)
-
-        return output_path
-    except Exception as e:
-        raise RuntimeError(f"Audio generation failed: {e}")
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    return concatenate_audio(list(iter_section_audio(paragraphs, lang, backend)), lang)
@@ -0,0 +1,233 @@
+"""
+Headless batch summarizer for a backlog of annual reports.
+
+Extraction and embedding run in a process pool (one report per task, results
+land in the shared ingestion cache). Workers extract serially, since the pool
+already uses the cores, and nothing is evicted from the cache until the batch
+is done, so every ingested report is still there when it is summarized. Section summaries for all reports are
+multiplexed on one event loop under a global LLM concurrency limit. Each
+report gets a JSON and a Markdown file; finished reports are recorded in a
+checkpoint so an interrupted run can be resumed.
+
+Usage:
+    python batch_summarize.py reports/ --output-dir out --workers 4 --llm-concurrency 8
+    python batch_summarize.py manifest.txt --stub-llm --stub-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from prompts import section_retrieval_prompts
+
+
+def discover_reports(source: str) -> List[str]:
+    """PDFs in a directory, or paths listed in a manifest (.txt lines or .json list)."""
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith(".pdf")
+        )
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        if source.lower().endswith(".json"):
+            paths = json.load(f)
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [p if os.path.isabs(p) else os.path.join(base, p) for p in paths]
+
+
+def _init_worker():
+    # Page-shard pools inside each worker would multiply the process count.
+    os.environ["ARS_EXTRACT_WORKERS"] = "1"
+    from ingestion import get_ingestion_cache
+
+    get_ingestion_cache().defer_eviction = True
+
+
+def ingest_report(path: str) -> Dict:
+    """Process-pool task: extract, chunk and embed one report into the ingestion cache."""
+    from ingestion import get_ingestion_cache, ingest_pdf
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    report = ingest_pdf(pdf_bytes)
+    return {
+        "key": get_ingestion_cache().key_for(pdf_bytes),
+        "chunks": len(report.chunks),
+        "from_cache": report.from_cache,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = json.load(f)
+
+    def is_done(self, report: str) -> bool:
+        return self.done.get(os.path.abspath(report), {}).get("status") == "done"
+
+    def mark_done(self, report: str, record: Dict):
+        self.done[os.path.abspath(report)] = dict(record, status="done")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.done, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def write_outputs(output_dir: str, report: str, summaries: Dict[str, str], formats: List[str]) -> List[str]:
+    stem = os.path.splitext(os.path.basename(report))[0]
+    written = []
+    if "json" in formats:
+        path = os.path.join(output_dir, f"{stem}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"report": report, "summaries": summaries}, f, indent=2, ensure_ascii=False)
+        written.append(path)
+    if "md" in formats:
+        path = os.path.join(output_dir, f"{stem}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# {stem}\n\n")
+            for section, summary in summaries.items():
+                f.write(f"## {section}\n\n{summary}\n\n")
+        written.append(path)
+    return written
+
+
+def build_models(args):
+    """Return (llm_model, query_gen_llm); query_gen_llm may be None."""
+    if args.stub_llm:
+        from llm_stub import StubGenerativeModel
+        # No query generator: stub variants compiled here would be stored as the real
+        # Groq expansions, which the app shares. Existing expansions are still used.
+        return StubGenerativeModel(latency=args.stub_latency), None
+
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    query_gen_llm = None
+    if os.getenv("GROQ_API_KEY"):
+        from langchain_groq import ChatGroq
+        from settings import QUERY_GEN_MODEL
+        query_gen_llm = ChatGroq(temperature=0, groq_api_key=os.getenv("GROQ_API_KEY"), model_name=QUERY_GEN_MODEL)
+    return genai.GenerativeModel("gemini-2.5-flash"), query_gen_llm
+
+
+def build_retriever(vectorstore, query_gen_llm, sections=None):
+    from query_expansion import PrecompiledMultiQueryRetriever, get_or_compile_expansions, load_expansions
+
+    expansions = load_expansions()
+    if expansions is None and query_gen_llm is not None:
+        expansions = get_or_compile_expansions(query_gen_llm)
+    if expansions is None:
+        return vectorstore.as_retriever(search_kwargs={"k": 20})
+    return PrecompiledMultiQueryRetriever(
+        vectorstore=vectorstore, expansions=expansions, k=20, section_pages=sections or {}
+    )
+
+
+async def run_batch(args) -> Dict:
+    from ingestion import get_ingestion_cache
+    from scheduler import summarize_sections_async
+
+    reports = discover_reports(args.source)
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.output_dir, "checkpoint.json"))
+    pending = [r for r in reports if not checkpoint.is_done(r)]
+    skipped = len(reports) - len(pending)
+
+    llm_model, query_gen_llm = build_models(args)
+    semaphore = asyncio.Semaphore(args.llm_concurrency)
+    loop = asyncio.get_running_loop()
+    stage_seconds = {"ingest": 0.0, "summarize": 0.0}
+    failures = {}
+    start = time.perf_counter()
+
+    async def process(report, executor):
+        try:
+            ingest = await loop.run_in_executor(executor, ingest_report, report)
+            stage_seconds["ingest"] += ingest["seconds"]
+
+            cached = await asyncio.to_thread(get_ingestion_cache().load, ingest["key"])
+            if cached is None:
+                raise RuntimeError("ingested report missing from cache")
+            _, vectorstore, sections = cached
+            retriever = build_retriever(vectorstore, query_gen_llm, sections)
+
+            summarize_start = time.perf_counter()
+            summaries = {}
+            async for section, summary, _ in summarize_sections_async(
+                retriever, llm_model, semaphore=semaphore, use_cache=not args.no_cache
+            ):
+                summaries[section] = summary
+            stage_seconds["summarize"] += time.perf_counter() - summarize_start
+
+            ordered = {s: summaries[s] for s in section_retrieval_prompts if s in summaries}
+            outputs = write_outputs(args.output_dir, report, ordered, args.format)
+            checkpoint.mark_done(report, {"key": ingest["key"], "chunks": ingest["chunks"], "outputs": outputs})
+            print(f"done  {report} ({ingest['chunks']} chunks)", flush=True)
+        except Exception as e:
+            failures[report] = str(e)
+            print(f"FAIL  {report}: {e}", file=sys.stderr, flush=True)
+
+    # Spawned, not forked: the event loop's helper threads are already running here.
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=_init_worker) as executor:
+            await asyncio.gather(*(process(report, executor) for report in pending))
+    finally:
+        get_ingestion_cache().evict()
+
+    elapsed = time.perf_counter() - start
+    completed = len(pending) - len(failures)
+    return {
+        "reports_total": len(reports),
+        "reports_completed": completed,
+        "reports_skipped": skipped,
+        "reports_failed": len(failures),
+        "failures": failures,
+        "wall_seconds": elapsed,
+        "reports_per_hour": (completed / elapsed * 3600) if elapsed and completed else 0.0,
+        "stage_seconds": stage_seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a directory or manifest of annual reports.")
+    parser.add_argument("source", help="Directory of PDFs, or a manifest (.txt one path per line, or .json list)")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output-dir>/checkpoint.json)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Processes for extraction and embedding")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Max concurrent LLM calls across all reports")
+    parser.add_argument("--format", nargs="+", choices=["json", "md"], default=["json", "md"])
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached summaries")
+    parser.add_argument("--stub-llm", action="store_true", help="Use a local deterministic LLM stub")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds per stub LLM call")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_batch(args))
+    print(
+        f"\n{result['reports_completed']} completed, {result['reports_skipped']} skipped, "
+        f"{result['reports_failed']} failed in {result['wall_seconds']:.1f}s "
+        f"({result['reports_per_hour']:.1f} reports/hour)"
+    )
+    for stage, seconds in result["stage_seconds"].items():
+        print(f"  {stage:<10} {seconds:8.1f}s total")
+    return 1 if result["reports_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
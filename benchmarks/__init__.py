@@ -0,0 +1 @@
+"""Benchmarks for the Annual Report Summarizer pipeline. Run from the repo root."""
@@ -0,0 +1,46 @@
+"""
+Serial vs parallel PDF extraction benchmark.
+
+Usage:
+    python -m benchmarks.bench_extraction --pages 50 200 600 --workers 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_report
+from pdf_processing import extract_text_from_pdf
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 600])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'serial_s':>9} {'parallel_s':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            generate_report(path, pages)
+            serial = _time(lambda: extract_text_from_pdf(path, workers=1), args.repeat)
+            parallel = _time(
+                lambda: extract_text_from_pdf(path, workers=args.workers, parallel_min_pages=0), args.repeat
+            )
+            print(f"{pages:>6} {serial:>9.3f} {parallel:>11.3f} {serial / parallel:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+PyMuPDF vs pdfkit (wkhtmltopdf) summary export benchmark.
+
+Usage:
+    python -m benchmarks.bench_pdf_export --sections 8 --words 300 --repeat 5
+"""
+
+import argparse
+import time
+
+from pdf_export import RENDERERS
+from prompts import section_summary_prompts
+
+
+def make_summaries(sections: int, words: int):
+    names = list(section_summary_prompts)
+    text = " ".join(["Revenue increased by 12% YoY while PAT margins improved."] * max(1, words // 9))
+    return {names[i % len(names)] + ("" if i < len(names) else f" ({i})"): text for i in range(sections)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=8)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    summaries = make_summaries(args.sections, args.words)
+    print(f"{'renderer':>9} {'best_s':>8} {'mean_s':>8} {'bytes':>9}")
+    for name, render in RENDERERS.items():
+        timings = []
+        try:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                pdf_bytes = render(summaries, "Generated Summaries")
+                timings.append(time.perf_counter() - start)
+        except Exception as e:
+            print(f"{name:>9} unavailable: {e}")
+            continue
+        print(f"{name:>9} {min(timings):>8.3f} {sum(timings) / len(timings):>8.3f} {len(pdf_bytes):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Labelled recall/latency benchmark: hybrid BM25 + dense vs multi-query retrieval.
+
+A synthetic report is generated with section-specific facts, so every
+chunk has a known section. For each section retrieval prompt, recall@k is
+the share of the top-k results drawn from that section's pages, out of
+min(k, chunks in the section). Retrievers compared:
+
+    dense        vectorstore.as_retriever(k) on the prompt alone
+    multi_query  LLM query variants (stub with --llm-latency), union of searches
+    hybrid       HybridRetriever (BM25 + dense, RRF), no LLM calls
+
+Section page filtering is left off for all three, so only ranking is compared;
+multi_query results past the first k of the union are not scored.
+
+Usage:
+    python -m benchmarks.bench_retrieval --pages 200 --llm-latency 0.5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic import section_page_ranges
+
+# Synthetic layout heading for each section retrieval prompt.
+SECTION_HEADINGS = {
+    "Business Information": "Business Overview",
+    "Corporate Information": "Corporate Information",
+    "Chairman's Letter": "Chairman's Message",
+    "Board's Report": "Board's Report",
+    "Shareholding Information": "Shareholding Pattern",
+    "Corporate Governance": "Report on Corporate Governance",
+    "Management Discussion and Analysis": "Management Discussion and Analysis",
+    "Consolidated Financial Statements": "Consolidated Financial Statements",
+}
+
+
+def _in_range(doc, page_range: Tuple[int, int]) -> bool:
+    from chunk_dedup import page_ranges
+
+    first, last = page_range
+    return any(start <= last and end >= first for start, end in page_ranges(doc.metadata))
+
+
+def recall_at_k(docs, chunks, page_range: Tuple[int, int], k: int) -> float:
+    relevant = sum(_in_range(c, page_range) for c in chunks)
+    if not relevant:
+        return 0.0
+    return sum(_in_range(d, page_range) for d in docs[:k]) / min(k, relevant)
+
+
+def multi_query_search(vectorstore, query_gen_llm, query: str, k: int) -> List:
+    """What MultiQueryRetriever does per call: LLM variants, then a union of searches."""
+    from query_expansion import _generate_variants
+
+    documents, seen = [], set()
+    for variant in _generate_variants(query_gen_llm, query):
+        for doc in vectorstore.similarity_search(variant, k=k):
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                documents.append(doc)
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per stub query-expansion call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import generate_report
+    from hybrid_retrieval import HybridRetriever, LexicalIndex
+    from ingestion import process_pdf
+    from llm_stub import StubChatModel
+    from prompts import section_retrieval_prompts
+    from vectorstore import create_vector_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ARS_CACHE_DIR"] = os.path.join(tmp, "cache")
+        os.environ["ARS_EMBED_CACHE"] = "0"
+        path = generate_report(os.path.join(tmp, "labelled.pdf"), args.pages, seed=args.seed, section_facts=True)
+        with open(path, "rb") as f:
+            chunks, _ = process_pdf(f.read())
+        vectorstore = create_vector_store(chunks, f"bench_retrieval_{args.pages}_{args.seed}")
+
+        start = time.perf_counter()
+        lexical_index = LexicalIndex(chunks)
+        index_seconds = time.perf_counter() - start
+
+        stub = StubChatModel(latency=args.llm_latency)
+        hybrid = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index, k=args.k)
+        dense = vectorstore.as_retriever(search_kwargs={"k": args.k})
+        retrievers = {
+            "dense": dense.invoke,
+            "multi_query": lambda q: multi_query_search(vectorstore, stub, q, args.k),
+            "hybrid": hybrid.invoke,
+        }
+
+        ranges = section_page_ranges(args.pages)
+        results: Dict[str, Dict[str, List[float]]] = {name: {"recall": [], "seconds": []} for name in retrievers}
+        print(f"{len(chunks)} chunks, BM25 index built in {index_seconds * 1000:.1f} ms\n")
+        print(f"{'section':<36}" + "".join(f"{name:>13}" for name in retrievers))
+        for section, prompt in section_retrieval_prompts.items():
+            page_range = ranges[SECTION_HEADINGS[section]]
+            row = f"{section:<36}"
+            for name, retrieve in retrievers.items():
+                start = time.perf_counter()
+                docs = retrieve(prompt)
+                results[name]["seconds"].append(time.perf_counter() - start)
+                recall = recall_at_k(docs, chunks, page_range, args.k)
+                results[name]["recall"].append(recall)
+                row += f"{recall:>13.2f}"
+            print(row)
+
+    print(f"\n{'retriever':<12} {'recall@' + str(args.k):>10} {'p50_ms':>9} {'max_ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<12} {statistics.mean(r['recall']):>10.3f} "
+              f"{statistics.median(r['seconds']) * 1000:>9.1f} {max(r['seconds']) * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
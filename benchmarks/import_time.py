@@ -0,0 +1,53 @@
+"""
+Import-time report for the modules app.py loads per stage.
+
+Runs `python -X importtime` in a fresh interpreter for each group and
+prints the cumulative import cost, so the login page can be compared with
+the full pipeline.
+
+Usage:
+    python -m benchmarks.import_time
+"""
+
+import re
+import subprocess
+import sys
+
+STAGES = {
+    # Everything app.py imports before the login gate.
+    "login": ["streamlit", "dotenv", "auth", "prompts", "sessions", "pdf_export", "scheduler", "translate", "audio"],
+    # What the first upload and summarization pull in on top.
+    "pipeline": [
+        "pdf_processing", "ingestion", "vectorstore", "query_expansion", "summarizer",
+        "google.generativeai", "langchain_groq", "langchain_classic.retrievers",
+    ],
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def cumulative_import_seconds(modules) -> float:
+    code = "\n".join(f"import {m}" for m in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total_us = 0
+    for match in _LINE.finditer(proc.stderr):
+        # Only top-level entries; nested ones are already in their parent's cumulative time.
+        if len(match.group(3)) == 1:
+            total_us += int(match.group(2))
+    return total_us / 1e6
+
+
+def main():
+    login = cumulative_import_seconds(STAGES["login"])
+    print(f"{'login page':<22} {login:8.3f}s")
+    try:
+        full = cumulative_import_seconds(STAGES["login"] + STAGES["pipeline"])
+        print(f"{'login + pipeline':<22} {full:8.3f}s  (login is {login / full:.0%})")
+    except RuntimeError as e:
+        print(f"{'login + pipeline':<22} unavailable: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Concurrent-session load test of the app workflow with local stand-ins.
+
+Each simulated user runs what app.py does for one session, in a thread as
+Streamlit would:
+  1. Upload a report to the shared IngestionWorker and poll it.
+  2. Build the selected retriever.
+  3. Generate all section summaries.
+  4. Translate them.
+  5. Synthesize section audio.
+  6. Render the summary PDF.
+Gemini, Groq, translation and TTS are replaced by llm_stub stand-ins with
+configurable latency and error rates. --stub-embeddings also replaces the
+embedding model.
+
+Every result is checked against the user's own report. Chunks must match
+a single-threaded reference ingest. Retrieved chunks, translations, audio
+files and PDFs must all belong to the session that asked for them. A
+mismatch means a cross-session leak (shared temp files, collection names,
+output paths) and is reported as an integrity failure, which also makes
+the exit status non-zero. The report covers throughput, p50/p95/p99 per
+stage (the session steps plus the internal spans from metrics.py), error
+and retry counts, peak RSS and CPU utilisation.
+
+Usage:
+    python -m benchmarks.load_test --users 8 --iterations 2 --reports 3 --pages 60 \\
+        --llm-latency 1.0 --llm-error-rate 0.05 --stub-embeddings
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Dict, List, Optional
+
+from benchmarks.run import git_commit, peak_rss_mb
+
+SESSION_STAGES = ("ingest", "retriever", "summarize", "verify", "translate", "audio", "pdf")
+_STUB_DIGEST_RE = re.compile(r"\[stub [0-9a-f]{12}\]")
+
+
+class IntegrityError(Exception):
+    """A session received data that belongs to another session or report."""
+
+
+class CpuSampler(threading.Thread):
+    """Process CPU time (all threads and reaped pool children) as a share of all cores."""
+
+    def __init__(self, interval: float = 0.5):
+        super().__init__(name="cpu-sampler", daemon=True)
+        self.interval = interval
+        self.samples: List[float] = []
+        self._finished = threading.Event()
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    def run(self):
+        cores = os.cpu_count() or 1
+        last_wall, last_cpu = time.monotonic(), self._cpu_seconds()
+        while not self._finished.wait(self.interval):
+            wall, cpu = time.monotonic(), self._cpu_seconds()
+            self.samples.append((cpu - last_cpu) / ((wall - last_wall) * cores))
+            last_wall, last_cpu = wall, cpu
+
+    def stop(self) -> Dict[str, Optional[float]]:
+        self._finished.set()
+        self.join()
+        if not self.samples:
+            return {"mean": None, "max": None, "saturated_share": None}
+        return {
+            "mean": sum(self.samples) / len(self.samples),
+            "max": max(self.samples),
+            # Share of samples with all cores at least 90% busy.
+            "saturated_share": sum(s >= 0.9 for s in self.samples) / len(self.samples),
+        }
+
+
+class LoadTest:
+    def __init__(self, args, reports: List[bytes], reference_chunks: List[frozenset]):
+        from llm_stub import StubChatModel, StubGenerativeModel, StubTranslator, StubTTS
+
+        self.args = args
+        self.reports = reports
+        self.reference_chunks = reference_chunks
+        self.llm = StubGenerativeModel(latency=args.llm_latency, error_rate=args.llm_error_rate, seed=1)
+        self.query_llm = StubChatModel(latency=args.groq_latency, error_rate=args.groq_error_rate, seed=2)
+        self.translator = StubTranslator(latency=args.translate_latency, error_rate=args.translate_error_rate, seed=3)
+        self.tts = StubTTS(latency=args.tts_latency, error_rate=args.tts_error_rate, seed=4)
+        self._lock = threading.Lock()
+        self.sessions: List[dict] = []
+
+    def _build_retriever(self, vectorstore, section_pages, lexical_index):
+        # Same choices as app.py, minus the live MultiQueryRetriever fallback.
+        if self.args.retriever == "hybrid":
+            from hybrid_retrieval import HybridRetriever
+            return HybridRetriever(
+                vectorstore=vectorstore, lexical_index=lexical_index, k=20, section_pages=section_pages
+            )
+        from query_expansion import PrecompiledMultiQueryRetriever, get_or_compile_expansions
+        return PrecompiledMultiQueryRetriever(
+            vectorstore=vectorstore, expansions=get_or_compile_expansions(self.query_llm), k=20,
+            section_pages=section_pages,
+        )
+
+    def _run_session(self, user: int, iteration: int, record: dict):
+        from audio import concatenate_audio, iter_section_audio
+        from llm_stub import stub_audio_bytes
+        from metrics import span
+        from pdf_export import get_summary_pdf
+        from prompts import section_retrieval_prompts
+        from scheduler import iter_section_summaries
+        from sessions import FAILED, get_ingestion_worker
+        from translate import translate_batch
+
+        report = (user + iteration) % len(self.reports)
+        record["report"] = report
+        session_id = uuid.uuid4().hex
+
+        def stage(name):
+            record["stage"] = name
+            return span(f"session.{name}", user=user, report=report)
+
+        with stage("ingest"):
+            worker = get_ingestion_worker()
+            job = worker.submit(session_id, f"report-{report}", self.reports[report])
+            while job.active:
+                worker.wait(job, timeout=0.5)
+            if job.status == FAILED:
+                raise RuntimeError(f"Ingestion failed: {job.error}")
+            chunks, vectorstore, _, section_pages, lexical_index = job.result
+            own = frozenset(c.page_content for c in chunks)
+            if own != self.reference_chunks[report]:
+                raise IntegrityError(f"user {user} got chunks that differ from report {report}")
+
+        with stage("retriever"):
+            retriever = self._build_retriever(vectorstore, section_pages, lexical_index)
+
+        with stage("summarize"):
+            summaries = {
+                section: summary
+                for section, summary, _ in iter_section_summaries(
+                    retriever, self.llm, use_cache=not self.args.no_cache
+                )
+            }
+            summaries = {s: summaries[s] for s in section_retrieval_prompts if s in summaries}
+            failed = [s for s, text in summaries.items() if text.startswith("Error summarizing")]
+            if failed:
+                raise RuntimeError(f"{len(failed)} sections failed, e.g. {summaries[failed[0]]}")
+
+        with stage("verify"):
+            for prompt in section_retrieval_prompts.values():
+                leaked = [d for d in retriever.invoke(prompt) if d.page_content not in own]
+                if leaked:
+                    raise IntegrityError(f"user {user} retrieved {len(leaked)} chunks from another report")
+
+        with stage("translate"):
+            translated = translate_batch(summaries, dest=self.args.lang, backend=self.translator)
+            wrong = [s for s in summaries if translated.get(s) != summaries[s].strip().swapcase()]
+            if wrong:
+                raise IntegrityError(f"user {user} got another session's translation for {wrong[0]!r}")
+
+        with stage("audio"):
+            texts = [f"{section}\n{text}" for section, text in translated.items()]
+            paths = list(iter_section_audio(texts, lang=self.args.lang, backend=self.tts))
+            expected = [stub_audio_bytes(text, self.args.lang) for text in texts]
+            for path, content in zip(paths, expected):
+                with open(path, "rb") as f:
+                    if f.read() != content:
+                        raise IntegrityError(f"user {user} got another session's audio at {path}")
+            with open(concatenate_audio(paths, lang=self.args.lang), "rb") as f:
+                if f.read() != b"".join(expected):
+                    raise IntegrityError(f"user {user} got another session's combined audio")
+
+        with stage("pdf"):
+            import fitz
+
+            pdf_bytes = get_summary_pdf(summaries, title="Generated Summaries")
+            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+                # NFKC undoes ligatures the renderer substitutes (e.g. "ff" in hex digests).
+                text = unicodedata.normalize("NFKC", "".join(page.get_text() for page in doc))
+            for summary in summaries.values():
+                marker = _STUB_DIGEST_RE.search(summary)
+                if marker and marker.group(0) not in text:
+                    raise IntegrityError(f"user {user} got a PDF without its own summaries")
+        record["stage"] = None
+
+    def user(self, user: int, start: threading.Event):
+        start.wait()
+        if self.args.ramp:
+            time.sleep(self.args.ramp * user / max(1, self.args.users))
+        for iteration in range(self.args.iterations):
+            record = {"user": user, "iteration": iteration, "ok": False, "failed_stage": None, "error": None}
+            began = time.perf_counter()
+            try:
+                self._run_session(user, iteration, record)
+                record["ok"] = True
+            except Exception as e:
+                record["failed_stage"] = record.get("stage")
+                record["error"] = f"{type(e).__name__}: {e}"
+                record["integrity"] = isinstance(e, IntegrityError)
+            record.pop("stage", None)
+            record["seconds"] = time.perf_counter() - began
+            with self._lock:
+                self.sessions.append(record)
+            if self.args.think_time:
+                time.sleep(self.args.think_time)
+
+    def run(self) -> dict:
+        from metrics import registry
+
+        registry.reset()
+        start = threading.Event()
+        threads = [threading.Thread(target=self.user, args=(i, start), name=f"user-{i}", daemon=True)
+                   for i in range(self.args.users)]
+        for t in threads:
+            t.start()
+        sampler = CpuSampler()
+        sampler.start()
+        began = time.perf_counter()
+        start.set()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - began
+        cpu = sampler.stop()
+
+        completed = sum(s["ok"] for s in self.sessions)
+        failures: Dict[str, int] = {}
+        for s in self.sessions:
+            if not s["ok"]:
+                failures[s["failed_stage"]] = failures.get(s["failed_stage"], 0) + 1
+        return {
+            "wall_seconds": wall,
+            "sessions": len(self.sessions),
+            "completed": completed,
+            "throughput_per_minute": 60 * completed / wall if wall else None,
+            "failures_by_stage": failures,
+            "integrity_failures": [s for s in self.sessions if s.get("integrity")],
+            "errors": [s["error"] for s in self.sessions if s["error"]][:20],
+            "stages": registry.summary(),
+            "peak_rss_mb": peak_rss_mb(),
+            "cpu": cpu,
+            "stub_calls": {
+                name: {"calls": stub.calls, "injected_errors": stub.errors}
+                for name, stub in (("gemini", self.llm), ("groq", self.query_llm),
+                                   ("translate", self.translator), ("tts", self.tts))
+            },
+        }
+
+
+def _ms(value) -> str:
+    return f"{value * 1000:>9.0f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(result: dict):
+    print(f"\n{result['completed']}/{result['sessions']} sessions completed in {result['wall_seconds']:.1f}s "
+          f"({result['throughput_per_minute']:.2f} sessions/min)")
+    cpu = result["cpu"]
+    if cpu["mean"] is not None:
+        print(f"CPU: mean {cpu['mean']:.0%}, max {cpu['max']:.0%}, saturated {cpu['saturated_share']:.0%} "
+              f"of samples ({os.cpu_count()} cores); peak RSS {result['peak_rss_mb']:.0f} MB")
+    if result["failures_by_stage"]:
+        print("Failures by stage: " + ", ".join(f"{k}={v}" for k, v in result["failures_by_stage"].items()))
+    print(f"\n{'stage':<26} {'count':>6} {'errors':>6} {'retries':>7} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+    stages = result["stages"]
+    session_stages = [f"session.{name}" for name in SESSION_STAGES if f"session.{name}" in stages]
+    for name in session_stages + sorted(set(stages) - set(session_stages)):
+        s = stages[name]
+        print(f"{name:<26} {s['count']:>6} {s['errors']:>6} {s['retries']:>7} "
+              f"{_ms(s['p50'])} {_ms(s['p95'])} {_ms(s['p99'])}")
+    for failure in result["integrity_failures"]:
+        print(f"INTEGRITY: user {failure['user']} iteration {failure['iteration']}: {failure['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated sessions")
+    parser.add_argument("--iterations", type=int, default=1, help="Workflows per user")
+    parser.add_argument("--reports", type=int, default=2, help="Distinct reports shared round-robin by users")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--retriever", choices=("hybrid", "multi_query"), default="multi_query")
+    parser.add_argument("--lang", default="hi")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which user starts are spread")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pause between a user's workflows")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    for name, latency in (("llm", 0.5), ("groq", 0.3), ("translate", 0.05), ("tts", 0.1)):
+        parser.add_argument(f"--{name}-latency", type=float, default=latency, help="Seconds per stub call")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help="Share of stub calls that fail")
+    parser.add_argument("--llm-rpm", type=int, default=6000,
+                        help="Gemini/Groq rate limits for the run (set to your quota to include throttling)")
+    parser.add_argument("--ingest-workers", type=int, help="ARS_INGEST_WORKERS for the run")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Replace the embedding model with a stub")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Stub embedding seconds per text")
+    parser.add_argument("--output", help="Also write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Fresh caches so repeated runs measure the same work.
+        os.environ["ARS_CACHE_DIR"] = os.path.join(workdir, "cache")
+        os.environ["ARS_GEMINI_RPM"] = os.environ["ARS_GROQ_RPM"] = str(args.llm_rpm)
+        if args.ingest_workers:
+            os.environ["ARS_INGEST_WORKERS"] = str(args.ingest_workers)
+
+        from benchmarks.synthetic import generate_report
+        from ingestion import process_pdf
+
+        if args.stub_embeddings:
+            from llm_stub import StubEmbeddings
+            from vectorstore import EmbeddingEngine, set_embedding_engine
+            set_embedding_engine(EmbeddingEngine(model=StubEmbeddings(latency_per_text=args.embed_latency)))
+
+        reports, reference = [], []
+        for i in range(args.reports):
+            path = generate_report(os.path.join(workdir, f"report_{i}.pdf"), args.pages, seed=i,
+                                   company=f"Example Industries {i} Limited")
+            with open(path, "rb") as f:
+                reports.append(f.read())
+            reference.append(frozenset(c.page_content for c in process_pdf(reports[-1])[0]))
+
+        print(f"{args.users} users x {args.iterations} workflows over {args.reports} reports of {args.pages} pages")
+        result = LoadTest(args, reports, reference).run()
+
+    print_report(result)
+    result.update(commit=git_commit(), cpu_count=os.cpu_count(), args=vars(args))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"Saved {args.output}")
+    return 1 if result["integrity_failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+End-to-end pipeline benchmark on synthetic annual reports.
+
+Times extract_text_from_pdf, preprocess_for_llm, chunk_document,
+deduplicate_chunks, create_vector_store, retrieval and summarize_all_sections for each page
+count, with a deterministic local LLM stub in place of Gemini/Groq. Each
+page count runs in a fresh interpreter with the embedding model loaded
+before timing starts, so stage times exclude the model load and peak RSS
+belongs to that report alone. Per stage, peak_rss_delta_mb is how far the
+stage raised the process high-water mark. Results are written as JSON
+tagged with the current git commit so runs can be compared.
+
+Usage:
+    python -m benchmarks.run --pages 100 400 --llm-latency 0.5 --output bench_results/run.json
+    python -m benchmarks.run --compare bench_results/old.json bench_results/new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Stages slower than this fraction over the baseline are flagged by --compare.
+REGRESSION_THRESHOLD = 0.10
+# Peak RSS growth is flagged when it also exceeds this many MB, ignoring allocator noise.
+RSS_REGRESSION_MIN_MB = 8.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str, **sizes):
+        peak_before = peak_rss_mb()
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        peak_after = peak_rss_mb()
+        self.stages[name] = dict(
+            sizes, seconds=seconds, peak_rss_mb=peak_after,
+            peak_rss_delta_mb=(peak_after - peak_before) if peak_after is not None else None,
+        )
+
+
+def bench_report(pages: int, workdir: str, llm_latency: float, table_density: float, seed: int) -> Dict:
+    from benchmarks.synthetic import generate_report
+    from chunk_dedup import deduplicate_chunks
+    from llm_stub import StubChatModel, StubGenerativeModel
+    from pdf_processing import (
+        chunk_document, detect_repeated_lines, extract_text_from_pdf, preprocess_for_llm, strip_repeated_lines,
+    )
+    from prompts import section_retrieval_prompts
+    from query_expansion import PrecompiledMultiQueryRetriever, compile_expansions
+    from summarizer import summarize_all_sections
+    from vectorstore import create_vector_store, get_embedding_engine
+
+    pdf_path = generate_report(
+        os.path.join(workdir, f"report_{pages}.pdf"), pages, table_density=table_density, seed=seed
+    )
+    # Load the model and run it once so embed_index times embedding, not the model load.
+    start = time.perf_counter()
+    engine = get_embedding_engine()
+    engine.warm_up()
+    engine.embed_query("warm up")
+    warmup_seconds = time.perf_counter() - start
+    baseline_rss_mb = peak_rss_mb()
+    timer = StageTimer()
+
+    with timer.stage("extract", pages=pages):
+        extracted = extract_text_from_pdf(pdf_path)
+    with timer.stage("preprocess", characters=sum(len(p["text"]) for p in extracted)):
+        repeated = detect_repeated_lines(pdf_path)
+        for p in extracted:
+            p["cleaned_text"] = preprocess_for_llm(strip_repeated_lines(p["text"], repeated))
+    with timer.stage("chunk"):
+        chunks = chunk_document(extracted)
+    timer.stages["chunk"]["chunks"] = len(chunks)
+    with timer.stage("dedup", chunks=len(chunks)):
+        chunks = deduplicate_chunks(chunks)
+    timer.stages["dedup"]["kept"] = len(chunks)
+    with timer.stage("embed_index", chunks=len(chunks)):
+        vectorstore = create_vector_store(chunks, f"bench_{pages}_{seed}")
+
+    expansions = compile_expansions(StubChatModel())
+    retriever = PrecompiledMultiQueryRetriever(vectorstore=vectorstore, expansions=expansions, k=20)
+    with timer.stage("retrieval", queries=len(section_retrieval_prompts)):
+        for prompt in section_retrieval_prompts.values():
+            retriever.invoke(prompt)
+
+    llm = StubGenerativeModel(latency=llm_latency)
+    with timer.stage("summarize", sections=len(section_retrieval_prompts)):
+        summarize_all_sections(retriever, llm, use_cache=False)
+
+    total = sum(stage["seconds"] for stage in timer.stages.values())
+    return {"pages": pages, "total_seconds": total, "warmup_seconds": warmup_seconds,
+            "baseline_rss_mb": baseline_rss_mb, "peak_rss_mb": peak_rss_mb(), "stages": timer.stages}
+
+
+def bench_report_isolated(pages: int, workdir: str, args) -> Dict:
+    """Run bench_report in a fresh interpreter, so ru_maxrss covers this report only."""
+    result_path = os.path.join(workdir, f"result_{pages}.json")
+    command = [
+        sys.executable, "-m", "benchmarks.run", "--pages", str(pages), "--llm-latency", str(args.llm_latency),
+        "--table-density", str(args.table_density), "--seed", str(args.seed),
+        "--workdir", workdir, "--result-file", result_path,
+    ]
+    # ARS_CACHE_DIR, ARS_EMBED_CACHE and the RPM limits are inherited through the environment.
+    subprocess.run(command, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with open(result_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline_path: str, current_path: str) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["pages"]: r for r in json.load(f)["reports"]}
+    with open(current_path, "r", encoding="utf-8") as f:
+        current = json.load(f)["reports"]
+
+    regressions = 0
+    print(f"{'pages':>6} {'stage':<12} {'base_s':>9} {'curr_s':>9} {'change':>8} {'base_mb':>9} {'curr_mb':>9}")
+    for report in current:
+        base = baseline.get(report["pages"])
+        if base is None:
+            continue
+        for name, stage in report["stages"].items():
+            if name not in base["stages"]:
+                continue
+            before, after = base["stages"][name]["seconds"], stage["seconds"]
+            change = (after - before) / before if before else 0.0
+            flags = ["time"] if change > REGRESSION_THRESHOLD else []
+            # Older result files have no per-stage delta.
+            rss_before = base["stages"][name].get("peak_rss_delta_mb")
+            rss_after = stage.get("peak_rss_delta_mb")
+            if rss_before is not None and rss_after is not None:
+                growth = rss_after - rss_before
+                if growth > RSS_REGRESSION_MIN_MB and growth > REGRESSION_THRESHOLD * rss_before:
+                    flags.append("memory")
+            regressions += bool(flags)
+            flag = f"  REGRESSION ({', '.join(flags)})" if flags else ""
+            print(f"{report['pages']:>6} {name:<12} {before:>9.3f} {after:>9.3f} {change:>+8.1%} "
+                  f"{_mb(rss_before):>9} {_mb(rss_after):>9}{flag}")
+    return 1 if regressions else 0
+
+
+def _mb(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the summarization pipeline on synthetic reports.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per stub LLM call")
+    parser.add_argument("--table-density", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results path (default: bench_results/<commit>.json)")
+    parser.add_argument("--llm-rpm", type=int, default=6000,
+                        help="Gemini/Groq rate limits for the run (set to your quota to include throttling)")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Keep the embedding cache enabled (measures repeat-report cost)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files instead of running")
+    # Used by bench_report_isolated to run one page count in a child process.
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+
+    if args.result_file:
+        result = bench_report(args.pages[0], args.workdir, args.llm_latency, args.table_density, args.seed)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep benchmark caches (stub expansions, embeddings) out of the real ones.
+        os.environ["ARS_CACHE_DIR"] = os.path.join(workdir, "cache")
+        if not args.warm_cache:
+            os.environ["ARS_EMBED_CACHE"] = "0"
+        # The summarize stage should time the pipeline, not the production rate limiter.
+        os.environ["ARS_GEMINI_RPM"] = os.environ["ARS_GROQ_RPM"] = str(args.llm_rpm)
+        reports = []
+        for pages in args.pages:
+            result = bench_report_isolated(pages, workdir, args)
+            reports.append(result)
+            stages = "  ".join(f"{name}={stage['seconds']:.2f}s" for name, stage in result["stages"].items())
+            print(f"{pages:>5} pages  total={result['total_seconds']:.2f}s  rss={result['peak_rss_mb']}MB  {stages}")
+
+    commit = git_commit()
+    output = args.output or os.path.join("bench_results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "llm_latency": args.llm_latency,
+            "reports": reports,
+        }, f, indent=2)
+    print(f"Saved {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
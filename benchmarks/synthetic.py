@@ -0,0 +1,173 @@
+"""
+Synthetic annual-report PDFs for benchmarks.
+
+Reports are generated with PyMuPDF at a given page count. Pages are split
+across the usual annual-report sections, each starting with a heading and a
+TOC bookmark. Body pages mix narrative paragraphs with text tables at a
+configurable density. With section_facts, each page also carries a few
+sentences specific to its section, so retrieval quality can be scored
+against known page ranges. Output is deterministic for a given seed.
+"""
+
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import fitz
+
+# (heading, share of pages)
+DEFAULT_LAYOUT: List[Tuple[str, float]] = [
+    ("Corporate Information", 0.03),
+    ("Chairman's Message", 0.03),
+    ("Business Overview", 0.06),
+    ("Board's Report", 0.12),
+    ("Management Discussion and Analysis", 0.12),
+    ("Report on Corporate Governance", 0.12),
+    ("Shareholding Pattern", 0.04),
+    ("Standalone Financial Statements", 0.22),
+    ("Consolidated Financial Statements", 0.26),
+]
+
+_SENTENCES = [
+    "Revenue from operations grew {pct}% year on year to Rs. {num} crore.",
+    "Profit after tax stood at Rs. {num} crore compared with Rs. {num2} crore in the previous year.",
+    "The Board met {small} times during the financial year and the gap between meetings did not exceed 120 days.",
+    "The Company continued to invest in capacity expansion, digital capabilities and talent.",
+    "Promoter and promoter group shareholding stood at {pct}% as at the end of the year.",
+    "The statutory auditors have issued an unmodified opinion on the financial statements.",
+    "Net cash from operating activities was Rs. {num} crore, reflecting improved working capital.",
+    "Foreign institutional investors held {pct}% and domestic institutions held {pct2}% of the equity.",
+    "The Company complied with the corporate governance requirements of the Listing Regulations.",
+    "Return on equity improved to {pct}% while the debt to equity ratio declined to 0.{small}.",
+]
+
+# Sentences only found in one section, keyed by layout heading.
+SECTION_FACTS: Dict[str, List[str]] = {
+    "Corporate Information": [
+        "The equity shares are listed on BSE Limited and the National Stock Exchange "
+        "with ISIN INE{small}{pct:02d}{pct2:02d}A01018.",
+        "The statutory auditors are {name} & Co., Chartered Accountants, and the bankers include State Bank of India.",
+        "Key managerial personnel: {name} (Chief Financial Officer) and {name2} (Company Secretary).",
+        "The registered office of the Company is at {small2} Industrial Estate, Mumbai.",
+    ],
+    "Chairman's Message": [
+        "Dear shareholders, as your Chairman I am pleased to share the highlights of an eventful year.",
+        "Our vision remains to build a resilient company, and the outlook for the coming year is positive.",
+        "I thank all stakeholders for their trust in the Company's long-term strategy.",
+    ],
+    "Business Overview": [
+        "The Company operates {small} business segments with a product portfolio serving domestic and global markets.",
+        "Key subsidiaries and joint ventures contributed Rs. {num} crore to consolidated revenue.",
+        "The Company strengthened its market position and achieved notable milestones during the year.",
+    ],
+    "Board's Report": [
+        "The Directors recommend a final dividend of Rs. {small} per equity share for the financial year.",
+        "CSR expenditure for the year was Rs. {num} crore against the prescribed obligation under the Companies Act.",
+        "The Directors' Report covers the risk management framework and internal audit compliance.",
+    ],
+    "Management Discussion and Analysis": [
+        "The industry outlook remains favourable and segment-wise performance improved across regions.",
+        "A SWOT analysis identifies strengths, weaknesses, opportunities and threats for the business.",
+        "Planned CAPEX of Rs. {num} crore and R&D investments support future growth plans.",
+    ],
+    "Report on Corporate Governance": [
+        "The Board comprises {small} independent directors out of {small2} directors, including women directors.",
+        "{small} board meetings and several committee meetings were held, as required by SEBI regulations.",
+        "Remuneration of directors and KMP is disclosed in the governance report.",
+    ],
+    "Shareholding Pattern": [
+        "Promoter holding was {pct}% and public shareholding was {pct2}% as per the shareholding pattern.",
+        "FII holding stood at {pct}% and DII holding at {pct2}%, with retail investors holding the balance.",
+        "The top ten shareholders and the monthly share price performance are tabulated below.",
+    ],
+    "Standalone Financial Statements": [
+        "The standalone balance sheet and statement of profit and loss are presented for the Company alone.",
+    ],
+    "Consolidated Financial Statements": [
+        "The consolidated balance sheet shows total assets of Rs. {num} crore and liabilities of Rs. {num2} crore.",
+        "The consolidated statement of profit and loss reports PAT of Rs. {num} crore.",
+        "The consolidated cash flow statement details operating, investing and financing activities.",
+    ],
+}
+
+_NAMES = ["A. Sharma", "R. Iyer", "S. Mehta", "P. Nair", "K. Rao", "V. Gupta"]
+
+_PAGE_RECT = fitz.paper_rect("a4")
+_BODY = fitz.Rect(50, 60, _PAGE_RECT.width - 50, _PAGE_RECT.height - 60)
+
+
+def _sentence(rng: random.Random, pool: Sequence[str] = _SENTENCES) -> str:
+    return rng.choice(pool).format(
+        pct=rng.randint(2, 60), pct2=rng.randint(2, 40),
+        num=f"{rng.randint(100, 99999):,}", num2=f"{rng.randint(100, 99999):,}", small=rng.randint(4, 9),
+        small2=rng.randint(10, 15), name=rng.choice(_NAMES), name2=rng.choice(_NAMES),
+    )
+
+
+def _paragraph(rng: random.Random, sentences: int, facts: Sequence[str] = ()) -> str:
+    # Facts lead the paragraph so they survive textbox overflow on table pages.
+    text = [_sentence(rng, facts) for _ in range(3 if facts else 0)]
+    return " ".join(text + [_sentence(rng) for _ in range(sentences)])
+
+
+def _table(rng: random.Random, rows: int) -> str:
+    header = f"{'Particulars':<34}{'FY2025':>14}{'FY2024':>14}"
+    lines = [header, "-" * len(header)]
+    for i in range(rows):
+        lines.append(f"{'Line item ' + str(i + 1):<34}{rng.randint(10, 99999):>14,}{rng.randint(10, 99999):>14,}")
+    return "\n".join(lines)
+
+
+def _section_pages(pages: int, layout: Sequence[Tuple[str, float]]) -> List[Tuple[str, int]]:
+    total = sum(share for _, share in layout)
+    counts = [max(1, round(pages * share / total)) for _, share in layout]
+    # Trim or pad the largest sections so counts add up to pages.
+    while sum(counts) > pages and max(counts) > 1:
+        counts[counts.index(max(counts))] -= 1
+    counts[counts.index(max(counts))] += pages - sum(counts)
+    return [(title, count) for (title, _), count in zip(layout, counts) if count > 0]
+
+
+def section_page_ranges(pages: int, layout: Optional[Sequence[Tuple[str, float]]] = None) -> Dict[str, Tuple[int, int]]:
+    """1-based (first_page, last_page) of each layout heading in a generated report."""
+    ranges = {}
+    first = 1
+    for title, count in _section_pages(pages, layout or DEFAULT_LAYOUT):
+        ranges[title] = (first, first + count - 1)
+        first += count
+    return ranges
+
+
+def generate_report(
+    path: str,
+    pages: int = 100,
+    layout: Optional[Sequence[Tuple[str, float]]] = None,
+    table_density: float = 0.3,
+    seed: int = 0,
+    company: str = "Example Industries Limited",
+    section_facts: bool = False,
+) -> str:
+    """Write a synthetic annual report to path and return path."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    toc = []
+    for title, count in _section_pages(pages, layout or DEFAULT_LAYOUT):
+        for i in range(count):
+            page = doc.new_page(width=_PAGE_RECT.width, height=_PAGE_RECT.height)
+            page.insert_text((50, 40), f"{company} | Annual Report 2024-25", fontsize=8)
+            page.insert_text((_PAGE_RECT.width - 80, _PAGE_RECT.height - 30), str(doc.page_count), fontsize=8)
+            y = _BODY.y0
+            if i == 0:
+                toc.append([1, title, doc.page_count])
+                page.insert_text((50, y + 16), title.upper(), fontsize=16)
+                y += 36
+            if rng.random() < table_density:
+                rows = rng.randint(8, 20)
+                rect = fitz.Rect(_BODY.x0, y, _BODY.x1, y + rows * 11 + 30)
+                page.insert_textbox(rect, _table(rng, rows), fontsize=8, fontname="cour")
+                y = rect.y1 + 10
+            facts = SECTION_FACTS.get(title, ()) if section_facts else ()
+            page.insert_textbox(fitz.Rect(_BODY.x0, y, _BODY.x1, _BODY.y1), _paragraph(rng, 28, facts), fontsize=9)
+    doc.set_toc(toc)
+    doc.save(path)
+    doc.close()
+    return path
@@ -0,0 +1,175 @@
+"""
+Near-duplicate chunk elimination before embedding and indexing.
+
+Annual reports repeat text heavily: notes to accounts and disclaimers
+appear in both the standalone and the consolidated statements. Chunks are
+compared by MinHash signatures over word shingles, with LSH banding so
+each chunk is only checked against likely matches. The first occurrence
+is kept; later near-duplicates are dropped and their pages are recorded on
+the kept chunk in metadata["source_pages"] (e.g. "53-54,88-89").
+
+Section retrieval filters chunks by page, so the merged page ranges are
+also stored as filterable page_start_N/page_end_N fields (page_filter()
+matches any of them). A chunk holds at most MAX_LOCATIONS ranges; a copy
+that would need more is kept rather than merged.
+"""
+
+import logging
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import span
+from settings import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+MAX_LOCATIONS = 4
+
+
+def dedup_enabled() -> bool:
+    return bool(env_int("ARS_DEDUP", 1))
+
+
+def dedup_threshold() -> float:
+    return env_float("ARS_DEDUP_THRESHOLD", 0.8)
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort (first, last) page ranges and merge overlapping or adjacent ones."""
+    merged: List[List[int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(a, b) for a, b in merged]
+
+
+def format_pages(ranges: Iterable[Tuple[int, int]]) -> str:
+    """Merge (first, last) page ranges into "1-2,45,88-89"."""
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in merge_ranges(ranges))
+
+
+def page_ranges(metadata: dict) -> List[Tuple[int, int]]:
+    """Every (first, last) page range a chunk stands for, including merged duplicates."""
+    ranges = [(metadata.get("page_start", 0), metadata.get("page_end", 0))]
+    for n in range(1, MAX_LOCATIONS + 1):
+        if f"page_start_{n}" in metadata:
+            ranges.append((metadata[f"page_start_{n}"], metadata[f"page_end_{n}"]))
+    return ranges
+
+
+def page_filter(first: int, last: int) -> dict:
+    """Chroma-style filter for chunks with any page range overlapping first..last."""
+    overlaps = [{"$and": [{"page_end": {"$gte": first}}, {"page_start": {"$lte": last}}]}]
+    overlaps += [
+        {"$and": [{f"page_end_{n}": {"$gte": first}}, {f"page_start_{n}": {"$lte": last}}]}
+        for n in range(1, MAX_LOCATIONS + 1)
+    ]
+    return {"$or": overlaps}
+
+
+class ChunkDeduplicator:
+    """
+    Streaming MinHash-LSH filter; add() each chunk in document order.
+
+    Two chunks are near-duplicates when the estimated Jaccard similarity of
+    their word shingles reaches threshold (ARS_DEDUP_THRESHOLD, default
+    0.8). With 64 permutations in 16 bands of 4 rows, pairs above ~0.5
+    similarity almost always share a band and are verified on the full
+    signature.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: int = 64, bands: int = 16,
+                 shingle_words: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold if threshold is not None else dedup_threshold()
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+        self._pages: List[List[Tuple[int, int]]] = []
+        self.kept: List = []
+        self.merged = set()  # indices into kept that absorbed duplicates
+        self.chunks_in = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        n = self.shingle_words
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64,
+                             count=len(shingles)) % _PRIME
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def add(self, chunk) -> bool:
+        """Return True if chunk is kept, False if it was merged into an earlier one."""
+        self.chunks_in += 1
+        signature = self.signature(chunk.page_content)
+        keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+        candidates = set()
+        for key in keys:
+            candidates.update(self._buckets.get(key, ()))
+        matches = []
+        for i in candidates:
+            similarity = float(np.mean(self._signatures[i] == signature))
+            if similarity >= self.threshold:
+                matches.append((similarity, i))
+        pages = (chunk.metadata.get("page_start", 0), chunk.metadata.get("page_end", 0))
+
+        # Merge into the closest match that can still list one more location;
+        # only keep the chunk as new when every match above threshold is full.
+        for _, best in sorted(matches, reverse=True):
+            ranges = merge_ranges(self._pages[best] + [pages])
+            if len(ranges) > MAX_LOCATIONS:
+                continue
+            kept = self.kept[best]
+            self._pages[best].append(pages)
+            kept.metadata["source_pages"] = format_pages(ranges)
+            kept.metadata["duplicates"] = kept.metadata.get("duplicates", 0) + 1
+            for n, (first, last) in enumerate(ranges, start=1):
+                kept.metadata[f"page_start_{n}"] = first
+                kept.metadata[f"page_end_{n}"] = last
+            self.merged.add(best)
+            return False
+
+        index = len(self.kept)
+        self.kept.append(chunk)
+        self._signatures.append(signature)
+        self._pages.append([pages])
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+        return True
+
+    @property
+    def reduction(self) -> float:
+        """Share of chunks dropped so far."""
+        return 1 - len(self.kept) / self.chunks_in if self.chunks_in else 0.0
+
+    def report(self):
+        logger.info(
+            "Dedup kept %d of %d chunks (%.1f%% reduction, threshold %.2f)",
+            len(self.kept), self.chunks_in, 100 * self.reduction, self.threshold,
+        )
+
+
+def deduplicate_chunks(chunks, threshold: Optional[float] = None) -> List:
+    """Drop near-duplicate chunks; kept chunks list the pages of what they replaced."""
+    if not dedup_enabled():
+        return list(chunks)
+    dedup = ChunkDeduplicator(threshold)
+    with span("dedup") as s:
+        kept = [chunk for chunk in chunks if dedup.add(chunk)]
+        s.set(chunks=dedup.chunks_in, kept=len(kept), reduction=round(dedup.reduction, 4))
+    dedup.report()
+    return kept
@@ -0,0 +1,124 @@
+"""
+Token-budgeted context packing for section summaries.
+
+Multi-query retrieval returns the same chunk several times, and the chunk
+overlap means neighbouring hits share text. Before a prompt is built the
+retrieved documents are deduplicated (exact and near-duplicate), ordered by
+maximal marginal relevance, and packed up to a per-section token budget.
+"""
+
+import hashlib
+import logging
+import math
+import re
+from typing import List, Optional, Sequence
+
+from settings import env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 12000
+NEAR_DUPLICATE_THRESHOLD = 0.8
+MMR_LAMBDA = 0.7
+_SHINGLE_SIZE = 5
+_WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for English financial text
+    # and avoids loading a tokenizer.
+    return math.ceil(len(text) / 4)
+
+
+def _shingles(text: str) -> frozenset:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= _SHINGLE_SIZE:
+        return frozenset([" ".join(words)])
+    return frozenset(" ".join(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1))
+
+
+def _overlap(a: frozenset, b: frozenset) -> float:
+    # Containment rather than Jaccard, so a chunk that is mostly inside a
+    # larger neighbour also counts as a duplicate.
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def deduplicate(docs: Sequence, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List:
+    """Drop exact and near-duplicate documents, keeping the first (best-ranked) copy."""
+    kept, kept_shingles, seen_hashes = [], [], set()
+    for doc in docs:
+        text = doc.page_content.strip()
+        digest = hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+        if not text or digest in seen_hashes:
+            continue
+        shingles = _shingles(text)
+        if any(_overlap(shingles, other) >= threshold for other in kept_shingles):
+            continue
+        seen_hashes.add(digest)
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def mmr_order(docs: Sequence, query: Optional[str] = None, embeddings=None, lambda_mult: float = MMR_LAMBDA) -> List:
+    """
+    Order documents by maximal marginal relevance.
+
+    With an embeddings object relevance and redundancy are cosine
+    similarities. Without one, relevance comes from retrieval rank and
+    redundancy from shingle overlap, so no model call is needed.
+    """
+    docs = list(docs)
+    if len(docs) <= 1:
+        return docs
+
+    if embeddings is not None and query:
+        vectors = embeddings.embed_documents([d.page_content for d in docs])
+        query_vector = embeddings.embed_query(query)
+        relevance = [_cosine(query_vector, v) for v in vectors]
+        similarity = lambda i, j: _cosine(vectors[i], vectors[j])
+    else:
+        relevance = [1.0 - rank / len(docs) for rank in range(len(docs))]
+        shingles = [_shingles(d.page_content) for d in docs]
+        similarity = lambda i, j: _overlap(shingles[i], shingles[j])
+
+    # redundancy[i] tracks max similarity to anything selected so far, so
+    # each round only compares against the newest pick.
+    selected, remaining = [], list(range(len(docs)))
+    redundancy = [0.0] * len(docs)
+    while remaining:
+        best = max(remaining, key=lambda i: lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy[i])
+        selected.append(best)
+        remaining.remove(best)
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], similarity(i, best))
+    return [docs[i] for i in selected]
+
+
+def build_context(docs: Sequence, query: Optional[str] = None, max_tokens: Optional[int] = None, embeddings=None) -> str:
+    """Deduplicate, MMR-order and pack documents into a context string within max_tokens."""
+    max_tokens = max_tokens or env_int("ARS_CONTEXT_TOKENS", DEFAULT_TOKEN_BUDGET)
+    naive_tokens = estimate_tokens("\n\n".join(d.page_content for d in docs))
+
+    parts, used = [], 0
+    for doc in mmr_order(deduplicate(docs), query=query, embeddings=embeddings):
+        cost = estimate_tokens(doc.page_content) + 1
+        if used + cost > max_tokens:
+            continue
+        parts.append(doc.page_content.strip())
+        used += cost
+
+    context = "\n\n".join(parts)
+    logger.info(
+        "Packed %d/%d documents into ~%d tokens (saved ~%d of %d)",
+        len(parts), len(docs), used, max(0, naive_tokens - used), naive_tokens,
+    )
+    return context
@@ -0,0 +1,186 @@
+"""
+Persistent chunk-level embedding cache.
+
+Vectors are stored as float16 rows of a memory-mapped file, one file per
+embedding model; a small SQLite index maps the hash of each normalized chunk
+text to its row. When the file is full the least-recently-used rows are
+reused, so only cache misses ever reach the model. Boilerplate that repeats
+across reports and years (governance text, auditor statements, disclaimers)
+is embedded once.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from settings import cache_dir, env_int
+
+VECTORS_FILE = "vectors.f16"
+INDEX_FILE = "index.sqlite"
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Capacity-bounded, LRU-evicted embedding store for one model."""
+
+    def __init__(self, model_name: str, root: Optional[str] = None, capacity: Optional[int] = None):
+        self.model_name = model_name
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.dir = os.path.join(root or cache_dir("embeddings"), slug)
+        os.makedirs(self.dir, exist_ok=True)
+        self.capacity = capacity or env_int("ARS_EMBED_CACHE_ENTRIES", 200_000)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._db = self._open_index()
+        self._dim = self._meta("dim")
+        if self._meta("capacity") not in (None, self.capacity):
+            # The row file was sized for another capacity; start over.
+            self._db.close()
+            shutil.rmtree(self.dir, ignore_errors=True)
+            os.makedirs(self.dir, exist_ok=True)
+            self._db = self._open_index()
+            self._dim = None
+
+    def _open_index(self) -> sqlite3.Connection:
+        # Autocommit mode, so every transaction below is opened explicitly.
+        db = sqlite3.connect(
+            os.path.join(self.dir, INDEX_FILE), check_same_thread=False, isolation_level=None, timeout=60
+        )
+        with self._transaction(db, "IMMEDIATE"):
+            db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        return db
+
+    @staticmethod
+    @contextmanager
+    def _transaction(db: sqlite3.Connection, mode: str = "DEFERRED"):
+        """
+        Run a block in one SQLite transaction; it doubles as the cross-process lock on the row file.
+
+        Batch workers and the app may share this cache directory. The index uses
+        SQLite's rollback journal, so a DEFERRED transaction holds a shared lock
+        once it has read, and EXCLUSIVE waits for all readers and blocks new ones.
+        Rows are only read under the former and only written under the latter, so
+        a reader never sees a slot that another process is reusing.
+        """
+        db.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _meta(self, name: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _rows(self, dim: int) -> np.memmap:
+        """Open the row file, creating it if needed; call inside an EXCLUSIVE transaction to create."""
+        if self._vectors is None:
+            path = os.path.join(self.dir, VECTORS_FILE)
+            mode = "r+" if os.path.exists(path) else "w+"
+            self._vectors = np.memmap(path, dtype=np.float16, mode=mode, shape=(self.capacity, dim))
+            if self._dim is None:
+                self._dim = dim
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    [("dim", dim), ("capacity", self.capacity)],
+                )
+        return self._vectors
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors in input order, None for misses."""
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            found = {}
+            results = [None] * len(keys)
+            with self._transaction(self._db):
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    found.update(self._db.execute(
+                        f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+                    ).fetchall())
+                if self._dim is None:
+                    # Another process may have created the row file since this one opened the cache.
+                    self._dim = self._meta("dim")
+                if found and self._dim is not None:
+                    rows = self._rows(self._dim)
+                    for i, key in enumerate(keys):
+                        slot = found.get(key)
+                        if slot is not None:
+                            results[i] = rows[slot].astype(np.float32).tolist()
+
+            if found:
+                now = time.time()
+                with self._transaction(self._db, "IMMEDIATE"):
+                    self._db.executemany(
+                        "UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                    )
+
+            hit_count = sum(r is not None for r in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+            return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if not texts:
+            return
+        with self._lock, self._transaction(self._db, "EXCLUSIVE"):
+            # Slots are counted and claimed under the lock, so concurrent writers never share one.
+            rows = self._rows(len(vectors[0]))
+            used = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            now = time.time()
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+                    continue
+                if used < self.capacity:
+                    slot = used
+                    used += 1
+                else:
+                    old_key, slot = self._db.execute(
+                        "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                    ).fetchone()
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                rows[slot] = np.asarray(vector, dtype=np.float16)
+                self._db.execute(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)", (key, slot, now)
+                )
+            rows.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+            }
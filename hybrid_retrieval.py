@@ -0,0 +1,155 @@
+"""
+Hybrid lexical + dense retrieval without LLM calls.
+
+Sections such as Corporate Information (ISIN codes, auditor names) and
+Shareholding Information (FII/DII percentages) hinge on exact terms that
+dense embeddings blur. A BM25 index is built over the report's chunks at
+ingestion time; at query time its ranking is fused with the dense vector
+store ranking by reciprocal rank fusion (RRF), which needs no score
+calibration between the two.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from chunk_dedup import MAX_LOCATIONS, page_filter, page_ranges
+from metrics import span
+
+# Keeps codes like INE002A01018, "sebi", "fy2025" and decimals like "12.5" whole.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in including is it its of on or s such the their this "
+    "to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """Okapi BM25 over a fixed list of chunks, with numpy postings per term."""
+
+    def __init__(self, chunks: Sequence[Document], k1: float = 1.5, b: float = 0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        with span("lexical_index", chunks=len(self.chunks)):
+            postings: Dict[str, Tuple[List[int], List[int]]] = {}
+            lengths = np.zeros(len(self.chunks), dtype=np.float32)
+            for i, chunk in enumerate(self.chunks):
+                counts = Counter(tokenize(chunk.page_content))
+                lengths[i] = sum(counts.values())
+                for term, tf in counts.items():
+                    ids, tfs = postings.setdefault(term, ([], []))
+                    ids.append(i)
+                    tfs.append(tf)
+            n = max(1, len(self.chunks))
+            avg_length = float(lengths.mean()) if len(self.chunks) else 1.0
+            # Length normalisation depends only on the document, so it is folded in once here.
+            self._norm = self.k1 * (1 - self.b + self.b * lengths / max(avg_length, 1e-9))
+            self._postings = {
+                term: (np.array(ids, dtype=np.int32), np.array(tfs, dtype=np.float32),
+                       math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5)))
+                for term, (ids, tfs) in postings.items()
+            }
+            # One row per chunk, one column per page range it stands for (see chunk_dedup);
+            # unused columns hold an empty range.
+            self._page_start = np.full((len(self.chunks), MAX_LOCATIONS + 1), np.iinfo(np.int32).max, dtype=np.int32)
+            self._page_end = np.full((len(self.chunks), MAX_LOCATIONS + 1), -1, dtype=np.int32)
+            for i, chunk in enumerate(self.chunks):
+                for j, (first, last) in enumerate(page_ranges(chunk.metadata)):
+                    self._page_start[i, j], self._page_end[i, j] = first, last
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            scores[ids] += qtf * idf * tfs * (self.k1 + 1) / (tfs + self._norm[ids])
+        return scores
+
+    def search(self, query: str, k: int = 20, page_range: Optional[Tuple[int, int]] = None) -> List[int]:
+        """Indices of the top-k chunks, best first; page_range keeps only chunks with pages in it."""
+        scores = self.scores(query)
+        if page_range:
+            first, last = page_range
+            overlaps = ((self._page_end >= first) & (self._page_start <= last)).any(axis=1)
+            scores[~overlaps] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Fuse rankings of keys by sum of 1 / (k + rank); ties keep first-seen order."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 + dense retrieval fused with RRF; a local alternative to MultiQueryRetriever.
+
+    Each side retrieves candidates_k results and the fused top k are
+    returned. When section_pages has a page range for the section being
+    queried, both sides are restricted to chunks overlapping it, falling
+    back to the whole document if that finds nothing.
+    """
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 20
+    candidates_k: int = 40
+    rrf_k: int = 60
+    section_pages: Dict[str, Tuple[int, int]] = {}
+
+    def _section_for(self, query: str) -> Optional[str]:
+        from prompts import section_retrieval_prompts
+
+        for section, prompt in section_retrieval_prompts.items():
+            if prompt == query:
+                return section
+        return None
+
+    def _retrieve(self, query: str, page_range: Optional[Tuple[int, int]]) -> List[Document]:
+        search_kwargs = {}
+        if page_range:
+            search_kwargs["filter"] = page_filter(*page_range)
+        dense = self.vectorstore.similarity_search(query, k=self.candidates_k, **search_kwargs)
+        lexical = [self.lexical_index.chunks[i]
+                   for i in self.lexical_index.search(query, self.candidates_k, page_range)]
+
+        documents = {}
+        for doc in lexical + dense:
+            documents.setdefault(doc.page_content, doc)
+        fused = reciprocal_rank_fusion(
+            [[d.page_content for d in dense], [d.page_content for d in lexical]], k=self.rrf_k
+        )
+        return [documents[key] for key in fused[:self.k]]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        page_range = self.section_pages.get(self._section_for(query))
+        if page_range:
+            documents = self._retrieve(query, page_range)
+            if documents:
+                return documents
+        return self._retrieve(query, None)
@@ -0,0 +1,373 @@
+"""
+Content-addressed ingestion cache.
+
+Uploaded reports are keyed by the SHA-256 of their bytes. The chunks and a
+persistent vector index are kept on disk under the cache root, so the
+same report is only extracted and embedded once across reruns, sessions and
+process restarts. Entries are evicted least-recently-used once the cache
+grows past its size budget.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from settings import cache_dir, env_int
+
+CHUNKS_FILE = "chunks.json"
+SECTIONS_FILE = "sections.json"
+# Bump when extraction, cleaning, chunking, chunk metadata or section indexing
+# changes its output, so entries written by older code become misses.
+PIPELINE_VERSION = 2
+
+
+class IngestedReport(NamedTuple):
+    chunks: list
+    vectorstore: object
+    from_cache: bool
+    sections: Dict[str, Tuple[int, int]]  # section name -> (first_page, last_page)
+    lexical_index: object  # hybrid_retrieval.LexicalIndex over chunks
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _chunks_to_json(chunks) -> list:
+    return [{"page_content": c.page_content, "metadata": dict(c.metadata)} for c in chunks]
+
+
+def _chunks_from_json(data: list):
+    from langchain_core.documents import Document
+
+    return [Document(page_content=d["page_content"], metadata=d.get("metadata") or {}) for d in data]
+
+
+class IngestionCache:
+    """On-disk store of processed reports, keyed by content hash."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None, memory_entries: int = 4):
+        self.root = root or cache_dir("ingestion")
+        os.makedirs(self.root, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = env_int("ARS_INGEST_CACHE_MB", 2048) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # key -> (chunks, vectorstore)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # Set while a batch run needs every entry it stores to survive until the
+        # batch ends; the batch then calls evict() itself.
+        self.defer_eviction = False
+
+    @staticmethod
+    def key_for(pdf_bytes: bytes) -> str:
+        """Hash of the report and of everything that decides how it is processed."""
+        digest = hashlib.sha256(pdf_bytes)
+        digest.update(f"|{processing_fingerprint()}".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def collection_name(key: str) -> str:
+        return f"report_{key[:32]}"
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def persist_directory(self, key: str) -> str:
+        # One subdirectory per backend, so switching ARS_VECTOR_BACKEND
+        # turns existing entries into misses instead of errors.
+        from vectorstore import vector_backend
+
+        return os.path.join(self.entry_dir(key), vector_backend())
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _remember(self, key: str, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _touch(self, key: str):
+        try:
+            os.utime(os.path.join(self.entry_dir(key), CHUNKS_FILE))
+        except OSError:
+            pass
+
+    def load(self, key: str):
+        """Return (chunks, vectorstore, sections) for a cached report, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                return self._memory[key]
+
+        chunks_path = os.path.join(self.entry_dir(key), CHUNKS_FILE)
+        if not os.path.exists(chunks_path):
+            return None
+        try:
+            from vectorstore import load_vector_store
+
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                chunks = _chunks_from_json(json.load(f))
+            vectorstore = load_vector_store(
+                self.collection_name(key), self.persist_directory(key)
+            )
+        except Exception:
+            # A partial or corrupt entry is treated as a miss and rebuilt.
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+            return None
+
+        sections = {}
+        try:
+            with open(os.path.join(self.entry_dir(key), SECTIONS_FILE), "r", encoding="utf-8") as f:
+                sections = {name: tuple(pages) for name, pages in json.load(f).items()}
+        except (OSError, ValueError):
+            pass  # Entries written before section indexing; search the whole report.
+
+        self._touch(key)
+        self._remember(key, (chunks, vectorstore, sections))
+        return chunks, vectorstore, sections
+
+    def store(self, key: str, chunks, sections: Optional[Dict[str, Tuple[int, int]]] = None, vectorstore=None):
+        """
+        Embed chunks into a persistent collection and record the entry.
+
+        If vectorstore is given, the chunks were already embedded into
+        persist_directory(key) (see pipeline.py) and only the entry is recorded.
+        """
+        from vectorstore import create_vector_store
+
+        entry = self.entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        if vectorstore is None:
+            vectorstore = create_vector_store(chunks, self.collection_name(key), self.persist_directory(key))
+
+        # chunks.json is written last and atomically; its presence marks the
+        # entry as complete.
+        for name, data in ((SECTIONS_FILE, sections or {}), (CHUNKS_FILE, _chunks_to_json(chunks))):
+            fd, tmp_path = tempfile.mkstemp(dir=entry, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, os.path.join(entry, name))
+
+        self._remember(key, (chunks, vectorstore, sections or {}))
+        if not self.defer_eviction:
+            self.evict(keep=key)
+        return vectorstore
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Drop least-recently-used entries until the cache fits max_bytes.
+
+        Entries held in memory (open vector stores of live sessions) or being
+        loaded or ingested right now are never removed.
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.path.getmtime(os.path.join(path, CHUNKS_FILE))
+            except OSError:
+                last_used = 0.0
+            entries.append((last_used, name, _dir_size(path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            with self._lock:
+                if name in self._memory:
+                    continue
+                key_lock = self._key_locks.get(name)
+            if key_lock is not None and not key_lock.acquire(blocking=False):
+                continue
+            try:
+                path = os.path.join(self.root, name)
+                try:
+                    # Without chunks.json the entry is a miss, even if the rest cannot be
+                    # removed yet (files still open elsewhere on Windows).
+                    os.remove(os.path.join(path, CHUNKS_FILE))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                with self._lock:
+                    self._key_locks.pop(name, None)
+                total -= size
+            finally:
+                if key_lock is not None:
+                    key_lock.release()
+
+
+def processing_fingerprint() -> str:
+    """Pipeline version and the settings that change chunks or sections, for IngestionCache.key_for."""
+    from chunk_dedup import dedup_enabled, dedup_threshold
+    from pdf_processing import CHUNK_OVERLAP, CHUNK_SIZE, REPEATED_LINE_SAMPLE, SECTION_MAX_PAGES
+
+    dedup = f"dedup={dedup_threshold()}" if dedup_enabled() else "dedup=off"
+    sections = f"sections={env_int('ARS_SECTION_MAX_PAGES', SECTION_MAX_PAGES)}"
+    return f"v{PIPELINE_VERSION}|chunk={CHUNK_SIZE}/{CHUNK_OVERLAP}|repeated={REPEATED_LINE_SAMPLE}|{dedup}|{sections}"
+
+
+class IngestionTooLarge(RuntimeError):
+    """Raised when a report holds more text than the per-job text budget."""
+
+
+def text_budget_bytes() -> int:
+    """
+    Per-job cap on text held during ingestion (ARS_INGEST_MAX_TEXT_MB, default 64).
+
+    This is a proxy, not a memory limit: it counts page and chunk text only,
+    not the PDF buffer, fitz documents, embeddings or Python object overhead,
+    which scale with it. 64 MB is roughly 15,000 dense pages, well above any
+    annual report, so it only stops pathological inputs.
+    """
+    return env_int("ARS_INGEST_MAX_TEXT_MB", 64) * 1024 * 1024
+
+
+def text_budget_error(budget: int) -> IngestionTooLarge:
+    return IngestionTooLarge(
+        f"Report has more than {budget // (1024 * 1024)} MB of text to ingest (ARS_INGEST_MAX_TEXT_MB)"
+    )
+
+
+def process_pdf(source, max_text_bytes: Optional[int] = None) -> Tuple[List, Dict[str, Tuple[int, int]]]:
+    """
+    Stream a PDF (path or in-memory bytes) through extraction, cleaning,
+    chunking and near-duplicate removal, and locate its sections.
+
+    Only the source buffer, the finished chunks and one page window are held
+    at a time. The text held is tracked against max_text_bytes (see
+    text_budget_bytes) and IngestionTooLarge is raised past it.
+    """
+    from chunk_dedup import ChunkDeduplicator, dedup_enabled
+    from metrics import record_span, span
+    from pdf_processing import build_section_index, iter_chunks, iter_clean_pages, read_toc
+
+    budget = max_text_bytes or text_budget_bytes()
+    held = peak = 0
+    heads = []
+    extracted = {"seconds": 0.0, "characters": 0}
+
+    def pages():
+        # Pages are cleaned as they are extracted, so this is the "extract" stage (cleaning included).
+        nonlocal peak
+        page_iter = iter_clean_pages(source)
+        while True:
+            start = time.perf_counter()
+            page = next(page_iter, None)
+            extracted["seconds"] += time.perf_counter() - start
+            if page is None:
+                return
+            heads.append({"page_number": page["page_number"], "head": page.pop("head")})
+            extracted["characters"] += len(page["cleaned_text"])
+            # Each page is alive until the chunker consumes it.
+            peak = max(peak, held + len(page["cleaned_text"]))
+            yield page
+
+    dedup = ChunkDeduplicator() if dedup_enabled() else None
+    with span("ingest") as s:
+        chunks, characters = [], 0
+        start, status = time.perf_counter(), "error"
+        try:
+            for chunk in iter_chunks(pages()):
+                if dedup is not None and not dedup.add(chunk):
+                    continue
+                chunks.append(chunk)
+                characters += len(chunk.page_content)
+                held += len(chunk.page_content)
+                peak = max(peak, held)
+                if peak > budget:
+                    raise text_budget_error(budget)
+            status = "ok"
+        finally:
+            # Extraction and chunking are interleaved; split the loop time between their spans.
+            record_span("extract", extracted["seconds"], status, pages=len(heads),
+                        characters=extracted["characters"])
+            record_span("chunk", time.perf_counter() - start - extracted["seconds"], status,
+                        chunks=len(chunks), characters=characters)
+        sections = build_section_index(heads, read_toc(source))
+        if dedup is not None:
+            s.set(chunks_before_dedup=dedup.chunks_in, dedup_reduction=round(dedup.reduction, 4))
+            dedup.report()
+        s.set(pages=len(heads), chunks=len(chunks), characters=characters, text_peak_mb=peak / (1024 * 1024))
+    return chunks, sections
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_ingestion_cache() -> IngestionCache:
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = IngestionCache()
+        return _default_cache
+
+
+def ingest_pdf(
+    pdf_bytes: bytes,
+    cache: Optional[IngestionCache] = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> IngestedReport:
+    """
+    Return the chunks, vector store and section page index for an uploaded report.
+
+    Identical uploads share one cache entry; only the first one pays for
+    extraction and embedding. progress, if given, is called with a fraction
+    and a stage message.
+    """
+    from hybrid_retrieval import LexicalIndex
+
+    progress = progress or (lambda fraction, message: None)
+    cache = cache or get_ingestion_cache()
+    key = cache.key_for(pdf_bytes)
+
+    with cache._key_lock(key):
+        progress(0.05, "Checking cache...")
+        cached = cache.load(key)
+        if cached is not None:
+            chunks, vectorstore, sections = cached
+            progress(1.0, "Loaded from cache")
+            return IngestedReport(chunks, vectorstore, True, sections, LexicalIndex(chunks))
+
+        if os.getenv("ARS_INGEST_PIPELINE", "1") != "0":
+            from pipeline import run_ingestion_pipeline
+
+            progress(0.1, "Extracting and embedding the document...")
+            chunks, vectorstore, sections = run_ingestion_pipeline(
+                pdf_bytes, cache.collection_name(key), cache.persist_directory(key), progress=progress
+            )
+            cache.store(key, chunks, sections, vectorstore=vectorstore)
+        else:
+            progress(0.1, "Extracting text from the document...")
+            chunks, sections = process_pdf(pdf_bytes)
+
+            progress(0.5, f"Embedding {len(chunks)} chunks...")
+            vectorstore = cache.store(key, chunks, sections)
+        progress(1.0, "Vector store ready")
+        return IngestedReport(chunks, vectorstore, False, sections, LexicalIndex(chunks))
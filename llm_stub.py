@@ -0,0 +1,111 @@
+"""
+Deterministic local stand-ins for the Gemini and Groq clients, the
+translation and TTS backends, and the embedding model.
+
+Used by the batch CLI, benchmarks and the load test to run the pipeline
+offline. Latency and error rates are configurable so scheduling,
+throughput and retry behaviour can be measured without network calls or
+API keys. Outputs are derived from the inputs, so callers can check that
+every result belongs to the request that produced it.
+"""
+
+import hashlib
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+
+class _Stub:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def _call(self):
+        """Count the call, sleep for the latency, and maybe fail like a busy server."""
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+            self.errors += fail
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            # ConnectionError is retried by scheduler.is_transient.
+            raise ConnectionError(f"{type(self).__name__}: 503 service unavailable (injected)")
+
+
+class StubGenerativeModel(_Stub):
+    """Mimics google.generativeai.GenerativeModel.generate_content."""
+
+    def __init__(self, latency: float = 0.0, model_name: str = "stub-gemini", error_rate: float = 0.0, seed=None):
+        super().__init__(latency, error_rate, seed)
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str):
+        self._call()
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        instruction = prompt.rsplit("Instruction:", 1)[-1].strip()[:80]
+        return SimpleNamespace(text=f"[stub {digest}] {len(prompt)} prompt chars. {instruction}")
+
+
+class StubChatModel(_Stub):
+    """Mimics ChatGroq.invoke for query expansion."""
+
+    def __init__(self, latency: float = 0.0, variants: int = 3, error_rate: float = 0.0, seed=None):
+        super().__init__(latency, error_rate, seed)
+        self.variants = variants
+
+    def invoke(self, prompt: str):
+        self._call()
+        question = prompt.rsplit("Original question:", 1)[-1].strip()
+        lines = [f"{question} (perspective {i + 1})" for i in range(self.variants)]
+        return SimpleNamespace(content="\n".join(lines))
+
+
+class StubTranslator(_Stub):
+    """Translation backend for translate.py: backend(text, dest) returns text.swapcase()."""
+
+    def __call__(self, text: str, dest: str) -> str:
+        self._call()
+        return text.swapcase()
+
+
+def stub_audio_bytes(text: str, lang: str) -> bytes:
+    return f"STUBMP3|{lang}|{hashlib.sha256(text.encode('utf-8')).hexdigest()}\n".encode("ascii")
+
+
+class StubTTS(_Stub):
+    """TTS backend for audio.py: backend(text, lang, path) writes stub_audio_bytes(text, lang)."""
+
+    def __call__(self, text: str, lang: str, output_path: str):
+        self._call()
+        with open(output_path, "wb") as f:
+            f.write(stub_audio_bytes(text, lang))
+
+
+class StubEmbeddings:
+    """Hash-seeded unit vectors in place of the sentence-transformer model (no semantic meaning)."""
+
+    def __init__(self, dim: int = 768, latency_per_text: float = 0.0):
+        self.dim = dim
+        self.latency_per_text = latency_per_text
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dim)]
+        norm = sum(v * v for v in vector) ** 0.5
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_per_text:
+            time.sleep(self.latency_per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
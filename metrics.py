@@ -0,0 +1,143 @@
+"""
+Lightweight tracing spans for pipeline stages.
+
+Each stage (extract, clean, chunk, embed, index, retrieve, generate,
+translate, tts) records its duration, input sizes (pages, chunks,
+characters, estimated tokens), retries and outcome into a process-wide
+registry. Recent spans can be exported as JSON lines, and per-stage
+latency summaries (p50/p95/p99) in Prometheus text format.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+MAX_SPANS = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Span:
+    __slots__ = ("stage", "start", "duration", "attrs", "status")
+
+    def __init__(self, stage: str, attrs: dict):
+        self.stage = stage
+        self.start = time.time()
+        self.duration = 0.0
+        self.attrs = attrs
+        self.status = "ok"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        if "characters" in attrs:
+            # ~4 characters per token, matching context_packing.estimate_tokens.
+            self.attrs["est_tokens"] = math.ceil(attrs["characters"] / 4)
+
+    def to_dict(self) -> dict:
+        return {"stage": self.stage, "start": self.start, "duration": self.duration,
+                "status": self.status, **self.attrs}
+
+
+class MetricsRegistry:
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=max_spans)
+        # Totals survive span eviction from the deque.
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            totals = self._totals.setdefault(span.stage, {"count": 0, "sum": 0.0, "errors": 0, "retries": 0})
+            totals["count"] += 1
+            totals["sum"] += span.duration
+            totals["errors"] += span.status != "ok"
+            totals["retries"] += span.attrs.get("retries", 0)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self) -> Dict[str, dict]:
+        """Per-stage count, total seconds, quantiles over recent spans, errors and retries."""
+        durations: Dict[str, List[float]] = {}
+        for span in self.spans():
+            durations.setdefault(span.stage, []).append(span.duration)
+        with self._lock:
+            totals = {stage: dict(t) for stage, t in self._totals.items()}
+        result = {}
+        for stage, t in totals.items():
+            values = sorted(durations.get(stage, []))
+            result[stage] = dict(t, **{f"p{int(q * 100)}": _quantile(values, q) for q in QUANTILES})
+        return result
+
+    def to_jsonl(self) -> str:
+        return "\n".join(json.dumps(span.to_dict(), default=str) for span in self.spans())
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP ars_stage_duration_seconds Pipeline stage latency.",
+            "# TYPE ars_stage_duration_seconds summary",
+        ]
+        summary = self.summary()
+        for stage, s in sorted(summary.items()):
+            for q in QUANTILES:
+                value = s[f"p{int(q * 100)}"]
+                if value is not None:
+                    lines.append(f'ars_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'ars_stage_duration_seconds_sum{{stage="{stage}"}} {s["sum"]:.6f}')
+            lines.append(f'ars_stage_duration_seconds_count{{stage="{stage}"}} {s["count"]}')
+        for name, key, help_text in (
+            ("ars_stage_errors_total", "errors", "Pipeline stage failures."),
+            ("ars_stage_retries_total", "retries", "Retries of transient errors."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, s in sorted(summary.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {s[key]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+
+def _quantile(sorted_values: List[float], q: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Span]:
+    """Time a block as one span of stage; attributes can be added with .set()."""
+    current = Span(stage, {})
+    current.set(**attrs)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        registry.record(current)
+
+
+def record_span(stage: str, duration: float, status: str = "ok", **attrs) -> Span:
+    """Record a span the caller timed itself, e.g. a streaming stage's busy time without queue waits."""
+    current = Span(stage, {})
+    current.set(**attrs)
+    current.start -= duration
+    current.duration = duration
+    current.status = status
+    registry.record(current)
+    return current
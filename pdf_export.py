@@ -0,0 +1,134 @@
+"""
+PDF export of generated summaries.
+
+Two renderers share one HTML layout: an in-process PyMuPDF renderer
+(fitz.Story, the default) and the original pdfkit/wkhtmltopdf one, which
+forks an external binary. Rendered bytes are cached on disk by a hash of
+(title, summaries, renderer), so Streamlit reruns reuse them; the cache is
+kept under ARS_PDF_CACHE_MB by dropping the least recently used exports.
+"""
+
+import hashlib
+import html as html_lib
+import io
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+from settings import cache_dir, env_int, evict_files, touch
+
+WKHTMLTOPDF_PATH = os.getenv("WKHTMLTOPDF_PATH", r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
+
+SUMMARY_CSS = """
+body {
+    font-family: Arial, Helvetica, sans-serif;
+    padding: 30px;
+    background-color: #ffffff;
+}
+h1 {
+    text-align: center;
+    color: #2C3E50;
+    margin-bottom: 25px;
+}
+h2 {
+    color: #1A5276;
+    margin-top: 25px;
+}
+p {
+    font-size: 14px;
+    line-height: 1.6;
+    text-align: justify;
+    color: #2c3e50;
+}
+"""
+
+
+def summaries_body(summaries: Dict[str, str], title: str) -> str:
+    body = f"<h1>{html_lib.escape(title)}</h1>"
+    for section, text in summaries.items():
+        body += f"<h2>{html_lib.escape(section)}</h2><p>{html_lib.escape(text)}</p>"
+    return body
+
+
+def create_pdf_pdfkit(summaries: dict, title: str = "Summaries") -> bytes:
+    """
+    Generate a clean, standard PDF using pdfkit (wkhtmltopdf backend).
+    No Unicode fonts or local file dependencies.
+    Safe for Windows systems without font setup.
+    """
+    import pdfkit
+
+    html = (
+        f'<html><head><meta charset="UTF-8"><style>{SUMMARY_CSS}</style></head>'
+        f"<body>{summaries_body(summaries, title)}</body></html>"
+    )
+    config = pdfkit.configuration(wkhtmltopdf=WKHTMLTOPDF_PATH)
+    # Generate the PDF safely (no file:// URLs)
+    return pdfkit.from_string(html, False, configuration=config)
+
+
+def create_pdf_pymupdf(summaries: dict, title: str = "Summaries") -> bytes:
+    """Render the same layout in-process with PyMuPDF's HTML Story engine."""
+    import fitz
+
+    story = fitz.Story(html=summaries_body(summaries, title), user_css=SUMMARY_CSS)
+    buffer = io.BytesIO()
+    writer = fitz.DocumentWriter(buffer)
+    mediabox = fitz.paper_rect("a4")
+    where = mediabox + (36, 36, -36, -36)
+    more = True
+    while more:
+        device = writer.begin_page(mediabox)
+        more, _ = story.place(where)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "pymupdf": create_pdf_pymupdf,
+    "pdfkit": create_pdf_pdfkit,
+}
+
+
+def _export_path(summaries: Dict[str, str], title: str, renderer: str) -> str:
+    payload = json.dumps([title, list(summaries.items()), renderer], ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir("pdf_exports"), f"{digest}.pdf")
+
+
+def cached_summary_pdf(summaries: Dict[str, str], title: str, renderer: Optional[str] = None) -> Optional[bytes]:
+    """Return previously rendered bytes, or None without rendering anything."""
+    path = _export_path(summaries, title, renderer or os.getenv("ARS_PDF_RENDERER", "pymupdf"))
+    try:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+    except OSError:
+        return None
+    touch(path)
+    return pdf_bytes
+
+
+def get_summary_pdf(summaries: Dict[str, str], title: str = "Summaries", renderer: Optional[str] = None) -> bytes:
+    """Render summaries to PDF once per (title, summaries, renderer) and cache the bytes."""
+    renderer = renderer or os.getenv("ARS_PDF_RENDERER", "pymupdf")
+    cached = cached_summary_pdf(summaries, title, renderer)
+    if cached is not None:
+        return cached
+
+    pdf_bytes = RENDERERS[renderer](summaries, title)
+    path = _export_path(summaries, title, renderer)
+    # A unique temp file per call: sessions are threads of one process and may export the same summaries.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    # Keep the export cache under ARS_PDF_CACHE_MB, least recently used first.
+    evict_files(os.path.dirname(path), env_int("ARS_PDF_CACHE_MB", 128) * 1024 * 1024, keep=[path])
+    return pdf_bytes
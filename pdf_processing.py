@@ -1,34 +1,452 @@
 import fitz
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Union
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import List, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple, Union
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-def extract_text_from_pdf(pdf_path: str) -> List[Dict[str, Union[int, str]]]:
+from metrics import span
+from settings import env_int
+
+# Serial extraction costs ~1.6 ms per page, while starting spawned workers costs
+# ~3 s and each parallel job also spills the upload to a temp file. Only very
+# large reports gain, and only the first of them pays for the (kept) pool.
+PARALLEL_MIN_PAGES = 1000
+
+CHUNK_SIZE = 1600
+CHUNK_OVERLAP = 200
+# Pages sampled, and lines checked at each page edge, for header/footer detection.
+REPEATED_LINE_SAMPLE = 24
+_EDGE_LINES = 3
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _extraction_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide extraction pool, started on first use and kept warm for later reports."""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != workers or getattr(_pool, "_broken", False):
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Spawned, not forked: the ingestion pipeline calls this from a thread while
+            # other threads (the embedder, Streamlit) run, and fork() would copy their locks.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = workers
+        return _pool
+
+
+def _default_workers() -> int:
+    try:
+        return int(os.getenv("ARS_EXTRACT_WORKERS", 0)) or (os.cpu_count() or 1)
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+PdfSource = Union[str, bytes, bytearray, memoryview]
+
+
+def _open(source: PdfSource) -> fitz.Document:
+    # In-memory uploads are opened straight from the buffer; no temp file.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+@contextmanager
+def _as_path(source: PdfSource):
+    """Yield a path for source, spilling in-memory PDFs to a per-call temp file."""
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _page_record(
+    page_number: int, text: str, clean: bool, repeated: FrozenSet[str] = frozenset()
+) -> Dict[str, Union[int, str]]:
+    if not clean:
+        return {'page_number': page_number, 'text': text}
+    # Keep only the cleaned text and the top lines (for heading detection);
+    # the raw page text is dropped straight away.
+    text = strip_repeated_lines(text, repeated)
+    return {'page_number': page_number, 'cleaned_text': preprocess_for_llm(text), 'head': head_lines(text)}
+
+
+def _extract_page_range(args) -> List[Dict[str, Union[int, str]]]:
+    # Runs in a worker process; each worker opens its own document handle.
+    pdf_path, start, stop, clean, repeated = args
     doc = fitz.open(pdf_path)
-    pages_data = [{'page_number': i + 1, 'text': page.get_text()} for i, page in enumerate(doc)]
+    try:
+        return [_page_record(i + 1, doc[i].get_text(), clean, repeated) for i in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _page_shards(page_count: int, workers: int):
+    # A few more shards than workers keeps the pool busy when some pages
+    # (tables, dense notes) are much slower than others.
+    shard_count = min(page_count, workers * 4)
+    size, extra = divmod(page_count, shard_count)
+    start = 0
+    for i in range(shard_count):
+        stop = start + size + (1 if i < extra else 0)
+        yield start, stop
+        start = stop
+
+
+def _iter_pages(
+    source: PdfSource, workers: int, parallel_min_pages: int, clean: bool, repeated: FrozenSet[str] = frozenset()
+):
+    doc = _open(source)
+    page_count = doc.page_count
+    if workers <= 1 or page_count < parallel_min_pages:
+        try:
+            for i in range(page_count):
+                yield _page_record(i + 1, doc[i].get_text(), clean, repeated)
+        finally:
+            doc.close()
+        return
     doc.close()
+
+    yielded = 0
+    try:
+        with _as_path(source) as pdf_path:
+            shards = [(pdf_path, start, stop, clean, repeated) for start, stop in _page_shards(page_count, workers)]
+            executor = _extraction_pool(workers)
+            # Concurrent ingestion jobs share the pool, so each keeps only its share of
+            # it busy, plus one shard so finished shards cannot pile up ahead of a slow
+            # consumer. Results are still yielded in page order.
+            window = max(1, workers // max(1, env_int("ARS_INGEST_WORKERS", 2))) + 1
+            remaining = iter(shards)
+            in_flight = deque(executor.submit(_extract_page_range, shard) for shard in islice(remaining, window))
+            try:
+                while in_flight:
+                    records = in_flight.popleft().result()
+                    for shard in islice(remaining, 1):
+                        in_flight.append(executor.submit(_extract_page_range, shard))
+                    for record in records:
+                        yield record
+                        yielded += 1
+            finally:
+                for future in in_flight:
+                    future.cancel()
+    except Exception:
+        # Pools can be unavailable (restricted sandboxes, broken workers);
+        # the serial path always works if nothing was produced yet.
+        if yielded:
+            raise
+        yield from _iter_pages(source, 1, parallel_min_pages, clean, repeated)
+
+
+def extract_text_from_pdf(
+    source: PdfSource,
+    workers: Optional[int] = None,
+    parallel_min_pages: int = PARALLEL_MIN_PAGES,
+) -> List[Dict[str, Union[int, str]]]:
+    """
+    Extract per-page text from a path or an in-memory PDF. Large documents
+    are split into contiguous page ranges and extracted in a process pool;
+    results keep page order.
+    """
+    workers = workers or _default_workers()
+    with span("extract") as s:
+        pages_data = list(_iter_pages(source, workers, parallel_min_pages, clean=False))
+        s.set(pages=len(pages_data), characters=sum(len(p['text']) for p in pages_data))
     return pages_data
 
+
+def iter_pages(
+    source: PdfSource,
+    workers: Optional[int] = None,
+    parallel_min_pages: int = PARALLEL_MIN_PAGES,
+) -> Iterator[Dict[str, Union[int, str]]]:
+    """Stream raw {'page_number', 'text'} records in page order."""
+    yield from _iter_pages(source, workers or _default_workers(), parallel_min_pages, clean=False)
+
+
+def page_count(source: PdfSource) -> int:
+    doc = _open(source)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def head_lines(text: str) -> str:
+    """The first few non-empty lines of a page, used for heading detection."""
+    return "\n".join([l for l in text.splitlines() if l.strip()][:_HEADING_LINES])
+
+
+def _line_key(line: str) -> str:
+    # Digits are masked so "Page 12" and "Page 13" count as the same line.
+    return re.sub(r'\d+', '#', " ".join(line.split()).lower())
+
+
+def detect_repeated_lines(
+    source: PdfSource, sample_pages: int = REPEATED_LINE_SAMPLE, min_share: float = 0.5
+) -> FrozenSet[str]:
+    """
+    Keys of running header/footer lines: lines found among the top or bottom
+    few lines of at least min_share of an evenly spaced sample of pages.
+    """
+    doc = _open(source)
+    try:
+        count = doc.page_count
+        if count < 4:
+            return frozenset()
+        n = min(sample_pages, count)
+        indices = sorted({round(i * (count - 1) / (n - 1)) for i in range(n)})
+        seen = Counter()
+        for i in indices:
+            lines = [l for l in doc[i].get_text().splitlines() if l.strip()]
+            seen.update({_line_key(l) for l in lines[:_EDGE_LINES] + lines[-_EDGE_LINES:]})
+    finally:
+        doc.close()
+    threshold = max(3, min_share * len(indices))
+    return frozenset(key for key, c in seen.items() if c >= threshold)
+
+
+def strip_repeated_lines(text: str, repeated: FrozenSet[str]) -> str:
+    """Drop repeated header/footer lines from the top and bottom edges of a page."""
+    if not repeated:
+        return text
+    lines = text.splitlines()
+    start, end = 0, len(lines)
+    checked = 0
+    while start < end and checked < _EDGE_LINES:
+        if lines[start].strip():
+            if _line_key(lines[start]) not in repeated:
+                break
+            checked += 1
+        start += 1
+    checked = 0
+    while end > start and checked < _EDGE_LINES:
+        if lines[end - 1].strip():
+            if _line_key(lines[end - 1]) not in repeated:
+                break
+            checked += 1
+        end -= 1
+    return "\n".join(lines[start:end])
+
+
+def iter_clean_pages(
+    source: PdfSource,
+    workers: Optional[int] = None,
+    parallel_min_pages: int = PARALLEL_MIN_PAGES,
+    strip_repeated: bool = True,
+) -> Iterator[Dict[str, Union[int, str]]]:
+    """
+    Stream pages as {'page_number', 'cleaned_text', 'head'} records.
+
+    Cleaning happens as each page is extracted (inside the pool workers in
+    parallel mode), so raw page text is never held for the whole document.
+    Running headers and footers (see detect_repeated_lines) are stripped
+    unless strip_repeated is False.
+    """
+    repeated = detect_repeated_lines(source) if strip_repeated else frozenset()
+    yield from _iter_pages(source, workers or _default_workers(), parallel_min_pages, True, repeated)
+
+
+# Heading variants for each section in prompts.section_retrieval_prompts.
+SECTION_HEADINGS = {
+    "Business Information": [
+        r"business overview", r"company overview", r"corporate overview", r"about (the company|us)", r"who we are",
+    ],
+    "Corporate Information": [r"corporate information", r"company information"],
+    "Chairman's Letter": [
+        r"chairman'?s? (message|letter|statement|speech)", r"(message|letter) from the chairman",
+        r"letter to (the )?(share|stake)holders",
+    ],
+    "Board's Report": [r"board'?s? report", r"directors'? report", r"report of the (board|directors)"],
+    "Shareholding Information": [
+        r"shareholding pattern", r"distribution of shareholding", r"(general )?shareholder'?s? information",
+    ],
+    "Corporate Governance": [r"(report on )?corporate governance( report)?$", r"report on corporate governance"],
+    "Management Discussion and Analysis": [
+        r"management'?s? discussion (and|&) analysis", r"management discussion",
+    ],
+    "Consolidated Financial Statements": [
+        r"consolidated financial statements?", r"consolidated balance sheet",
+        r"independent auditor'?s? report on (the )?consolidated",
+    ],
+}
+_SECTION_RES = {
+    section: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for section, patterns in SECTION_HEADINGS.items()
+}
+_HEADING_LINES = 6
+_HEADING_MAX_CHARS = 80
+# Without bookmarks a section's end is only known when another section's
+# heading is found, so the last one found (or one followed by unrecognised
+# chapters) would otherwise run to the end of the report.
+SECTION_MAX_PAGES = 60
+
+
+def _match_section(title: str) -> Optional[str]:
+    # Headings start with the section name (after any numbering); matching
+    # only at the start keeps body sentences from counting as headings.
+    title = re.sub(r"^[\d.\s\-:|]+", "", title.replace("\u2019", "'"))
+    for section, patterns in _SECTION_RES.items():
+        if any(p.match(title) for p in patterns):
+            return section
+    return None
+
+
+def read_toc(source: PdfSource) -> List[List]:
+    doc = _open(source)
+    try:
+        return doc.get_toc()
+    finally:
+        doc.close()
+
+
+def _sections_from_toc(toc: List[List], page_count: int) -> Dict[str, Tuple[int, int]]:
+    sections = {}
+    for i, entry in enumerate(toc):
+        level, title, start = entry[:3]
+        section = _match_section(title)
+        if section is None or section in sections or start < 1:
+            continue
+        # The section runs until the next bookmark at the same or a higher level.
+        end = page_count
+        for next_entry in toc[i + 1:]:
+            next_level, next_start = next_entry[0], next_entry[2]
+            if next_level <= level and next_start > start:
+                end = next_start - 1
+                break
+        sections[section] = (start, end)
+    return sections
+
+
+def _sections_from_headings(pages: List[Dict[str, Union[int, str]]]) -> Dict[str, Tuple[int, int]]:
+    starts = []  # (page_number, section)
+    previous = set()
+    for page in pages:
+        top = page.get('head', page.get('text', ''))
+        lines = [l.strip() for l in top.splitlines() if l.strip()][:_HEADING_LINES]
+        found = {_match_section(l) for l in lines if len(l) <= _HEADING_MAX_CHARS} - {None}
+        # A contents page names many sections at once; it starts none of them.
+        if len(found) >= 3:
+            found = set()
+        # Running headers repeat a section title on every page; only the
+        # first page of a run starts the section.
+        for section in found - previous:
+            starts.append((page['page_number'], section))
+        previous = found
+
+    sections = {}
+    starts.sort()
+    last_page = pages[-1]['page_number'] if pages else 0
+    max_pages = max(1, env_int("ARS_SECTION_MAX_PAGES", SECTION_MAX_PAGES))
+    for i, (start, section) in enumerate(starts):
+        if section in sections:
+            continue
+        end = next((s for s, other in starts[i + 1:] if other != section and s > start), last_page + 1) - 1
+        sections[section] = (start, min(end, start + max_pages - 1))
+    return sections
+
+
+def build_section_index(
+    pages: List[Dict[str, Union[int, str]]], toc: Optional[List[List]] = None
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Map each report section to an inclusive (first_page, last_page) range.
+
+    PDF bookmarks are used first; sections missing from them are located by
+    heading lines at the top of pages and capped at ARS_SECTION_MAX_PAGES.
+    Sections not found are left out so retrieval can fall back to the whole
+    document.
+    """
+    with span("section_index", pages=len(pages)) as s:
+        page_count = pages[-1]['page_number'] if pages else 0
+        sections = _sections_from_toc(toc or [], page_count)
+        for section, page_range in _sections_from_headings(pages).items():
+            sections.setdefault(section, page_range)
+        s.set(sections=len(sections))
+    return sections
+
+
 def preprocess_for_llm(text: str) -> str:
     text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
     text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
     text = re.sub(r'\s{2,}', ' ', text)
     return text.strip()
 
-def chunk_document(processed_pages: List[Dict[str, Union[int, str]]]):
-    full_text = ""
-    for page in processed_pages:
-        page_separator = f"\n\n--- PAGE {page['page_number']} ---\n\n"
-        full_text += page_separator + page['cleaned_text']
+def _page_pieces(text: str, chunk_size: int, splitter) -> List[str]:
+    if len(text) <= chunk_size:
+        return [text]
+    return splitter.split_text(text)
+
+
+def _make_chunk(window) -> Document:
+    pages = [page_number for _, page_number in window]
+    return Document(
+        page_content="\n\n".join(text for text, _ in window),
+        metadata={"page_start": min(pages), "page_end": max(pages)},
+    )
+
 
+def iter_chunks(
+    processed_pages: Iterable[Dict[str, Union[int, str]]],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> Iterator[Document]:
+    """
+    Stream chunks page by page.
+
+    Mirrors the splitter settings chunk_document always used: pages are the
+    primary split unit and are merged up to chunk_size with chunk_overlap of
+    trailing pages carried over; pages longer than chunk_size are split on
+    their own. Only the current merge window is held in memory.
+    """
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1600, chunk_overlap=200, length_function=len,
-        is_separator_regex=True, separators=[r"\n\n--- PAGE \d+ ---\n\n", "\n\n", "\n", " ", ""]
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len,
+        separators=["\n\n", "\n", " ", ""]
     )
-    chunks = splitter.create_documents([full_text])
-    final_chunks = []
-    for chunk in chunks:
-        chunk.page_content = re.sub(r"--- PAGE \d+ ---", "", chunk.page_content).strip()
-        chunk.metadata = {}
-        final_chunks.append(chunk)
-    return final_chunks
+    sep_len = 2  # len("\n\n") joining pieces of a chunk
+    window = deque()  # (text, page_number)
+    total = 0
+
+    for page in processed_pages:
+        text = page['cleaned_text'].strip()
+        if not text:
+            continue
+        for piece in _page_pieces(text, chunk_size, splitter):
+            piece_len = len(piece)
+            if window and total + piece_len + sep_len > chunk_size:
+                yield _make_chunk(window)
+                while window and (total > chunk_overlap or total + piece_len + sep_len > chunk_size):
+                    total -= len(window[0][0]) + (sep_len if len(window) > 1 else 0)
+                    window.popleft()
+            window.append((piece, page['page_number']))
+            total += piece_len + (sep_len if len(window) > 1 else 0)
+
+    if window:
+        yield _make_chunk(window)
+
+
+def chunk_document(processed_pages: Iterable[Dict[str, Union[int, str]]]) -> List[Document]:
+    with span("chunk") as s:
+        chunks = list(iter_chunks(processed_pages))
+        s.set(chunks=len(chunks), characters=sum(len(c.page_content) for c in chunks))
+    return chunks
@@ -0,0 +1,222 @@
+"""
+Pipelined ingestion: extract -> clean -> chunk -> embed, running concurrently.
+
+Each stage runs in its own thread and hands work to the next through a
+bounded queue, so embedding starts as soon as the first chunks exist and
+time-to-ready approaches the slowest stage rather than the sum of all of
+them. Full queues block the upstream stage (back-pressure), which keeps
+memory flat regardless of report size. Near-duplicate chunks are dropped
+in the chunk stage (chunk_dedup.py) before they reach the embedder.
+
+Each stage records its own span (extract, clean, chunk, index) timed by
+busy time, i.e. without the time spent waiting on its queues, so stage
+latencies stay comparable with the sequential path.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from settings import env_int
+
+_DONE = object()
+
+
+class _Stop(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+class IngestionPipeline:
+    def __init__(self, batch_size: Optional[int] = None, queue_size: Optional[int] = None,
+                 max_text_bytes: Optional[int] = None, progress: Optional[Callable[[float, str], None]] = None):
+        self.batch_size = batch_size or env_int("ARS_EMBED_BATCH_SIZE", 32) * 2
+        self.queue_size = queue_size or env_int("ARS_PIPELINE_QUEUE", 16)
+        self.max_text_bytes = max_text_bytes  # None: ingestion.text_budget_bytes()
+        self.progress = progress or (lambda fraction, message: None)
+        self.stage_seconds: Dict[str, float] = {}  # busy seconds per stage
+        self.stage_attrs: Dict[str, dict] = {}
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self._waits = threading.local()
+
+    def _put(self, q: queue.Queue, item):
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stop()
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self._waits.seconds += time.perf_counter() - start
+
+    def _items(self, q: queue.Queue):
+        while True:
+            start = time.perf_counter()
+            try:
+                while True:
+                    if self._stop.is_set():
+                        raise _Stop()
+                    try:
+                        item = q.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        continue
+            finally:
+                self._waits.seconds += time.perf_counter() - start
+            if item is _DONE:
+                return
+            yield item
+
+    def _thread(self, name: str, stage: str, fn, out_q: Optional[queue.Queue]) -> threading.Thread:
+        from metrics import record_span
+
+        def run():
+            self._waits.seconds = 0.0
+            start = time.perf_counter()
+            status = "ok"
+            try:
+                fn()
+                if out_q is not None:
+                    self._put(out_q, _DONE)
+            except _Stop:
+                status = "error"
+            except BaseException as e:
+                status = "error"
+                self._errors.append(e)
+                self._stop.set()
+            finally:
+                wall = time.perf_counter() - start
+                busy = max(0.0, wall - self._waits.seconds)
+                self.stage_seconds[name] = busy
+                record_span(stage, busy, status, wall_seconds=round(wall, 4),
+                            wait_seconds=round(self._waits.seconds, 4), **self.stage_attrs.get(name, {}))
+
+        return threading.Thread(target=run, name=f"ingest-{name}", daemon=True)
+
+    def run(self, source, collection_name: str, persist_directory: Optional[str] = None):
+        """Return (chunks, vectorstore, sections) for a PDF path or in-memory bytes."""
+        from metrics import span
+        from pdf_processing import (
+            build_section_index, detect_repeated_lines, head_lines, iter_chunks, iter_pages, page_count,
+            preprocess_for_llm, read_toc, strip_repeated_lines,
+        )
+        from chunk_dedup import ChunkDeduplicator, dedup_enabled
+        from ingestion import text_budget_bytes, text_budget_error
+        from vectorstore import create_empty_vector_store, persist_vector_store, update_chunk_metadata
+
+        total_pages = max(1, page_count(source))
+        raw_pages = queue.Queue(self.queue_size)
+        clean_pages = queue.Queue(self.queue_size)
+        chunk_queue = queue.Queue(self.queue_size * 4)
+        heads, chunks = [], []
+        dedup = ChunkDeduplicator() if dedup_enabled() else None
+        state = {"vectorstore": None, "embedded": 0}
+        attrs = self.stage_attrs
+        attrs.update(extract={"pages": 0, "characters": 0}, clean={"pages": 0, "characters": 0},
+                     chunk={"chunks": 0, "characters": 0}, embed={"chunks": 0})
+        # Text held: kept chunks and page text queued between stages (a proxy; see text_budget_bytes).
+        budget = self.max_text_bytes or text_budget_bytes()
+        memory = {"held": 0, "peak": 0}
+        memory_lock = threading.Lock()
+
+        def track(delta: int) -> int:
+            with memory_lock:
+                memory["held"] += delta
+                memory["peak"] = max(memory["peak"], memory["held"])
+                return memory["held"]
+
+        def extract():
+            for page in iter_pages(source):
+                attrs["extract"]["pages"] += 1
+                attrs["extract"]["characters"] += len(page["text"])
+                track(len(page["text"]))
+                self._put(raw_pages, page)
+
+        repeated = detect_repeated_lines(source)
+
+        def clean():
+            for page in self._items(raw_pages):
+                raw = page.pop("text")
+                text = strip_repeated_lines(raw, repeated)
+                heads.append({"page_number": page["page_number"], "head": head_lines(text)})
+                page["cleaned_text"] = preprocess_for_llm(text)
+                attrs["clean"]["pages"] += 1
+                attrs["clean"]["characters"] += len(page["cleaned_text"])
+                track(len(page["cleaned_text"]) - len(raw))
+                self._put(clean_pages, page)
+                self.progress(0.1 + 0.8 * len(heads) / total_pages,
+                              f"Processed {len(heads)}/{total_pages} pages, embedded {state['embedded']} chunks")
+
+        def pages():
+            for page in self._items(clean_pages):
+                yield page
+                # The chunker has moved on; what it still needs is in its window.
+                track(-len(page["cleaned_text"]))
+
+        def chunk():
+            for c in iter_chunks(pages()):
+                if dedup is not None and not dedup.add(c):
+                    continue
+                # Ids let metadata merged in by later duplicates be pushed to the store.
+                c.id = f"chunk-{len(chunks)}"
+                chunks.append(c)
+                attrs["chunk"]["chunks"] += 1
+                attrs["chunk"]["characters"] += len(c.page_content)
+                if track(len(c.page_content)) > budget:
+                    raise text_budget_error(budget)
+                self._put(chunk_queue, c)
+
+        def embed():
+            vectorstore = create_empty_vector_store(collection_name, persist_directory)
+            state["vectorstore"] = vectorstore
+            batch = []
+            for c in self._items(chunk_queue):
+                batch.append(c)
+                if len(batch) >= self.batch_size:
+                    vectorstore.add_documents(batch)
+                    state["embedded"] += len(batch)
+                    attrs["embed"]["chunks"] = state["embedded"]
+                    batch = []
+            if batch:
+                vectorstore.add_documents(batch)
+                state["embedded"] += len(batch)
+                attrs["embed"]["chunks"] = state["embedded"]
+
+        threads = [
+            self._thread("extract", "extract", extract, raw_pages),
+            self._thread("clean", "clean", clean, clean_pages),
+            self._thread("chunk", "chunk", chunk, chunk_queue),
+            # Per-batch model time is in the "embed" spans; this one matches create_vector_store's.
+            self._thread("embed", "index", embed, None),
+        ]
+        with span("pipeline", pages=total_pages) as s:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            if self._errors:
+                raise self._errors[0]
+            if not chunks:
+                raise ValueError("No chunks provided for vector store.")
+            vectorstore = state["vectorstore"]
+            if dedup is not None:
+                # Chunks may have absorbed duplicates after they were embedded.
+                update_chunk_metadata(vectorstore, [dedup.kept[i] for i in sorted(dedup.merged)])
+                s.set(chunks_before_dedup=dedup.chunks_in, dedup_reduction=round(dedup.reduction, 4))
+                dedup.report()
+            persist_vector_store(vectorstore)
+            sections = build_section_index(heads, read_toc(source))
+            s.set(chunks=len(chunks), characters=sum(len(c.page_content) for c in chunks),
+                  text_peak_mb=memory["peak"] / (1024 * 1024),
+                  **{f"{name}_seconds": seconds for name, seconds in self.stage_seconds.items()})
+        return chunks, vectorstore, sections
+
+
+def run_ingestion_pipeline(source, collection_name: str, persist_directory: Optional[str] = None,
+                           progress: Optional[Callable[[float, str], None]] = None) -> Tuple[list, object, dict]:
+    return IngestionPipeline(progress=progress).run(source, collection_name, persist_directory)
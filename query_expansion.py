@@ -0,0 +1,181 @@
+"""
+Precompiled query expansions for the static section retrieval prompts.
+
+MultiQueryRetriever asks the Groq LLM for query variants on every
+summarization run, although the eight section prompts never change. This
+module generates the variants and their embeddings once per version of
+prompts.py and stores them on disk; retrieval then only runs local vector
+searches.
+
+Compile ahead of time with:
+    python query_expansion.py
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from chunk_dedup import page_filter
+from prompts import section_retrieval_prompts
+from settings import EMBEDDING_MODEL_NAME, QUERY_GEN_MODEL, cache_dir
+
+EXPANSIONS_FILE = "expansions.json"
+
+# Same instruction MultiQueryRetriever uses, so compiled variants match the
+# ones generated at query time.
+EXPANSION_PROMPT = (
+    "You are an AI language model assistant. Your task is to generate 3 "
+    "different versions of the given user question to retrieve relevant documents "
+    "from a vector database. By generating multiple perspectives on the user "
+    "question, your goal is to help the user overcome some of the limitations of "
+    "distance-based similarity search. Provide these alternative questions "
+    "separated by newlines. Original question: {question}"
+)
+
+
+def prompts_version(query_model: str = QUERY_GEN_MODEL) -> str:
+    """Hash of prompts.py plus the models involved; changes invalidate the file."""
+    prompts_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.py")
+    digest = hashlib.sha256()
+    with open(prompts_path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"|{query_model}|{EMBEDDING_MODEL_NAME}|{EXPANSION_PROMPT}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _expansions_path() -> str:
+    return os.path.join(cache_dir("query_expansions"), EXPANSIONS_FILE)
+
+
+def _generate_variants(query_gen_llm, question: str) -> List[str]:
+    response = query_gen_llm.invoke(EXPANSION_PROMPT.format(question=question))
+    text = getattr(response, "content", response)
+    return [line.strip() for line in str(text).split("\n") if line.strip()]
+
+
+def compile_expansions(query_gen_llm, embeddings=None, query_model: str = QUERY_GEN_MODEL) -> Dict[str, Any]:
+    """Generate and store variants plus embeddings for every section prompt."""
+    if embeddings is None:
+        from vectorstore import get_embedding_engine
+        embeddings = get_embedding_engine()
+
+    sections = {}
+    for section, prompt in section_retrieval_prompts.items():
+        # The original prompt is searched too; it costs nothing at query time.
+        queries = [prompt] + _generate_variants(query_gen_llm, prompt)
+        sections[section] = {
+            "prompt": prompt,
+            "queries": queries,
+            "embeddings": embeddings.embed_documents(queries),
+        }
+
+    data = {"version": prompts_version(query_model), "sections": sections}
+    path = _expansions_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+    return data
+
+
+def load_expansions(query_model: str = QUERY_GEN_MODEL) -> Optional[Dict[str, Any]]:
+    """Return compiled expansions, or None if missing or built from older prompts."""
+    try:
+        with open(_expansions_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != prompts_version(query_model):
+        return None
+    return data
+
+
+_compile_locks: Dict[str, threading.Lock] = {}
+_compile_locks_lock = threading.Lock()
+
+
+def get_or_compile_expansions(query_gen_llm, query_model: str = QUERY_GEN_MODEL) -> Dict[str, Any]:
+    """Load the compiled expansions, compiling them once if missing; concurrent sessions wait for it."""
+    expansions = load_expansions(query_model)
+    if expansions is not None:
+        return expansions
+    version = prompts_version(query_model)
+    with _compile_locks_lock:
+        lock = _compile_locks.setdefault(version, threading.Lock())
+    with lock:
+        # Another session may have compiled them while this one waited.
+        return load_expansions(query_model) or compile_expansions(query_gen_llm, query_model=query_model)
+
+
+class PrecompiledMultiQueryRetriever(BaseRetriever):
+    """
+    Drop-in replacement for MultiQueryRetriever over compiled expansions.
+
+    Known section prompts are answered with one vector search per stored
+    variant embedding; any other query falls back to a plain search. When
+    section_pages has a page range for the section, searches are restricted
+    to chunks overlapping it, falling back to the whole document if that
+    finds nothing.
+    """
+
+    vectorstore: Any
+    expansions: Dict[str, Any]
+    k: int = 20
+    search_kwargs: Dict[str, Any] = {}
+    section_pages: Dict[str, Tuple[int, int]] = {}
+
+    def _entry_for(self, query: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        for section, entry in self.expansions["sections"].items():
+            if entry["prompt"] == query:
+                return section, entry
+        return None, None
+
+    def _search(self, entry: Dict[str, Any], search_kwargs: Dict[str, Any]) -> List[Document]:
+        search_batch = getattr(self.vectorstore, "similarity_search_by_vectors", None)
+        if search_batch is not None:
+            # All variants in one matrix multiply (NumpyVectorStore).
+            results = search_batch(entry["embeddings"], k=self.k, **search_kwargs)
+        else:
+            results = [self.vectorstore.similarity_search_by_vector(embedding, k=self.k, **search_kwargs)
+                       for embedding in entry["embeddings"]]
+        documents = []
+        seen = set()
+        for hits in results:
+            for doc in hits:
+                if doc.page_content not in seen:
+                    seen.add(doc.page_content)
+                    documents.append(doc)
+        return documents
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        section, entry = self._entry_for(query)
+        if entry is None:
+            return self.vectorstore.similarity_search(query, k=self.k, **self.search_kwargs)
+
+        page_range = self.section_pages.get(section)
+        if page_range:
+            documents = self._search(entry, dict(self.search_kwargs, filter=page_filter(*page_range)))
+            if documents:
+                return documents
+        return self._search(entry, self.search_kwargs)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from langchain_groq import ChatGroq
+
+    load_dotenv()
+    llm = ChatGroq(temperature=0, groq_api_key=os.getenv("GROQ_API_KEY"), model_name=QUERY_GEN_MODEL)
+    compiled = compile_expansions(llm)
+    for name, section in compiled["sections"].items():
+        print(f"{name}: {len(section['queries'])} queries")
+    print(f"Saved to {_expansions_path()}")
@@ -0,0 +1,94 @@
+"""
+Persistent cache of LLM section summaries.
+
+Identical requests (same model, same summary instruction, same packed
+context) are answered from a SQLite file instead of calling the model
+again. Entries expire after a TTL and the least-recently-used ones are
+dropped once the cache holds more than max_entries.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from settings import cache_dir, env_int
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def model_name_of(llm_model) -> str:
+    return getattr(llm_model, "model_name", None) or type(llm_model).__name__
+
+
+def response_key(model_name: str, prompt: str) -> str:
+    # The prompt is the summary instruction plus the packed context, so
+    # hashing it covers both.
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{model_name}\0{prompt_hash}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        self.path = path or os.path.join(cache_dir("responses"), "responses.sqlite")
+        self.ttl_seconds = ttl_seconds or env_int("ARS_LLM_CACHE_TTL", DEFAULT_TTL_SECONDS)
+        self.max_entries = max_entries or env_int("ARS_LLM_CACHE_ENTRIES", DEFAULT_MAX_ENTRIES)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, response: str, model: str = ""):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
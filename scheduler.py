@@ -0,0 +1,229 @@
+"""
+Asyncio scheduler for section summarization.
+
+Every provider (Gemini, Groq) has one token-bucket limiter shared by all
+sessions in the process, so concurrent users stay under the account quota
+together. Calls get a per-call timeout and jittered exponential backoff on
+transient errors (429s, 5xx, timeouts). Summaries are yielded as soon as
+each section finishes rather than in submission order. Summaries already in
+the response cache are returned without calling the model.
+"""
+
+import asyncio
+import contextlib
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+from metrics import span
+from settings import env_int
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_RETRIES = 4
+
+_TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+# Matched by class name across the MRO so the provider SDKs need not be imported:
+# google.api_core.exceptions, groq/openai-style clients and httpx.
+_TRANSIENT_TYPES = frozenset({
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "BadGateway", "GatewayTimeout", "RateLimitError", "APITimeoutError", "APIConnectionError",
+    "TimeoutException", "NetworkError",
+})
+# Fallback for SDKs that only put the status in the message ("429 Resource has been exhausted").
+# A bare number elsewhere ("Input exceeds 1500 tokens") is not a status code.
+_TRANSIENT_MESSAGE_RE = re.compile(
+    r"(?:^|\b(?:http|status|code|error)[\s:=]*)(?:408|429|50[0234])\b"
+    r"|rate.?limit|resource.?exhausted|quota exceeded|service unavailable|overloaded|timed out|deadline exceeded"
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; awaiting callers sleep instead of spinning."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(rate_per_minute // 6)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        # Take a token now (possibly going negative) and return how long the
+        # caller must wait for it to become valid.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> TokenBucket:
+    """Process-wide limiter for a provider; rate from ARS_<PROVIDER>_RPM."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = TokenBucket(env_int(f"ARS_{provider.upper()}_RPM", 30))
+        return _limiters[provider]
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for value in (getattr(exc, "status_code", None), getattr(exc, "code", None),
+                  getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _TRANSIENT_TYPES for cls in type(exc).__mro__):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in _TRANSIENT_STATUS
+    return bool(_TRANSIENT_MESSAGE_RE.search(str(exc).lower()))
+
+
+def describe_error(exc: BaseException) -> str:
+    """Exception type plus message; str() alone is empty for e.g. TimeoutError()."""
+    message = str(exc)
+    return f"{type(exc).__name__}: {message}" if message else type(exc).__name__
+
+
+async def call_with_retry(
+    fn: Callable,
+    *args,
+    provider: Optional[str] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    retries: int = DEFAULT_RETRIES,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    executor: Optional[Executor] = None,
+):
+    """
+    Run a blocking call in a thread under the provider's limiter, retrying transient errors.
+
+    A call that exceeds timeout is abandoned, not retried: its thread cannot be
+    cancelled and may still complete, so a retry would duplicate it.
+    """
+    name = getattr(fn, "__name__", str(fn))
+    loop = asyncio.get_running_loop()
+    with span(f"call.{provider or 'local'}", function=name, retries=0) as s:
+        for attempt in range(retries + 1):
+            if provider:
+                await get_limiter(provider).acquire()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{name} did not finish within {timeout:g}s") from None
+            except Exception as e:
+                if attempt >= retries or not is_transient(e):
+                    raise
+                s.set(retries=attempt + 1)
+                # Full jitter keeps retries from many sessions from re-aligning.
+                await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+async def summarize_sections_async(
+    retriever,
+    llm_model,
+    sections=None,
+    llm_provider: str = "gemini",
+    retriever_provider: Optional[str] = None,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[Tuple[str, str, bool]]:
+    """
+    Yield (section, summary, cached) in completion order.
+
+    use_cache=False forces regeneration; fresh results still refresh the cache.
+    A semaphore shared between calls caps concurrent model calls globally.
+    """
+    from prompts import section_retrieval_prompts
+    from response_cache import get_response_cache, model_name_of, response_key
+    from summarizer import build_section_prompt, generate_summary
+
+    sections = list(sections or section_retrieval_prompts.keys())
+    timeout = timeout or float(env_int("ARS_LLM_TIMEOUT", int(DEFAULT_TIMEOUT)))
+    cache = get_response_cache()
+    model_name = model_name_of(llm_model)
+    # Not the loop's default executor: asyncio.run() joins that on exit, which
+    # would hold the caller until every timed-out call had returned anyway.
+    executor = ThreadPoolExecutor(max_workers=2 * len(sections) or 1, thread_name_prefix="section-call")
+
+    async def run(section):
+        try:
+            prompt = await call_with_retry(
+                build_section_prompt, section, retriever, provider=retriever_provider, timeout=timeout,
+                executor=executor,
+            )
+            if prompt is None:
+                return section, f"Prompts for '{section}' not found.", False
+            key = response_key(model_name, prompt)
+            if use_cache:
+                cached = cache.get(key)
+                if cached is not None:
+                    return section, cached, True
+            async with semaphore or contextlib.nullcontext():
+                summary = await call_with_retry(
+                    generate_summary, llm_model, prompt, provider=llm_provider, timeout=timeout,
+                    executor=executor,
+                )
+            cache.put(key, summary, model=model_name)
+            return section, summary, False
+        except Exception as e:
+            return section, f"Error summarizing {section}: {describe_error(e)}", False
+
+    try:
+        for next_done in asyncio.as_completed([run(section) for section in sections]):
+            yield await next_done
+    finally:
+        # Abandoned calls finish in the background; nothing waits for them.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_section_summaries(retriever, llm_model, **kwargs) -> Iterator[Tuple[str, str, bool]]:
+    """
+    Synchronous view of summarize_sections_async for Streamlit and scripts.
+
+    The event loop runs in a helper thread so callers that already have a
+    loop (or none) can both use it.
+    """
+    results = queue.Queue()
+    done = object()
+
+    async def drain():
+        async for item in summarize_sections_async(retriever, llm_model, **kwargs):
+            results.put(item)
+
+    def runner():
+        try:
+            asyncio.run(drain())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    threading.Thread(target=runner, name="section-scheduler", daemon=True).start()
+    while True:
+        item = results.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
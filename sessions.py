@@ -0,0 +1,134 @@
+"""
+Background ingestion jobs and per-session state.
+
+Uploads are ingested on a small worker pool instead of the Streamlit script
+thread. Each job has an ID and progress that the UI polls across reruns.
+Sessions are tracked by ID; a session idle for longer than the timeout has
+its jobs and vector store handles dropped so memory does not grow with
+every upload.
+
+Vector collections are content-addressed (see ingestion.py): every report
+lives in its own collection and directory, so concurrent sessions never
+write to a shared collection name.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from settings import env_int
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    session_id: str
+    upload_id: str
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = "Queued"
+    result: Any = None  # ingestion.IngestedReport when done
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+
+class IngestionWorker:
+    """Runs ingestion jobs on a bounded thread pool and tracks sessions."""
+
+    def __init__(self, max_workers: Optional[int] = None, idle_timeout: Optional[int] = None):
+        self.max_workers = max_workers or env_int("ARS_INGEST_WORKERS", 2)
+        self.idle_timeout = idle_timeout or env_int("ARS_SESSION_IDLE_SECONDS", 1800)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._session_jobs: Dict[str, str] = {}  # session_id -> latest job_id
+        self._last_seen: Dict[str, float] = {}
+
+    def touch(self, session_id: str):
+        with self._lock:
+            self._last_seen[session_id] = time.time()
+        self.evict_idle()
+
+    def submit(self, session_id: str, upload_id: str, pdf_bytes: bytes) -> IngestionJob:
+        """Start ingesting an upload, or return the session's job for it if one exists."""
+        self.touch(session_id)
+        with self._lock:
+            current = self._jobs.get(self._session_jobs.get(session_id))
+            if current is not None and current.upload_id == upload_id and current.status != FAILED:
+                return current
+            job = IngestionJob(job_id=uuid.uuid4().hex, session_id=session_id, upload_id=upload_id)
+            self._jobs[job.job_id] = job
+            self._session_jobs[session_id] = job.job_id
+        self._executor.submit(self._run, job, pdf_bytes)
+        return job
+
+    def _run(self, job: IngestionJob, pdf_bytes: bytes):
+        from ingestion import ingest_pdf
+
+        def report(fraction, message):
+            job.progress, job.message = fraction, message
+
+        job.status = RUNNING
+        try:
+            job.result = ingest_pdf(pdf_bytes, progress=report)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job: IngestionJob, timeout: float) -> IngestionJob:
+        """Block briefly so fast (cached) jobs finish within the same rerun."""
+        deadline = time.monotonic() + timeout
+        while job.active and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return job
+
+    def evict_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            for session_id in [s for s, seen in self._last_seen.items() if seen < cutoff]:
+                del self._last_seen[session_id]
+                job_id = self._session_jobs.pop(session_id, None)
+                job = self._jobs.get(job_id)
+                if job is not None and not job.active:
+                    del self._jobs[job_id]
+            # Drop superseded jobs that no session points at any more.
+            live = set(self._session_jobs.values())
+            for job_id in [j for j, job in self._jobs.items() if j not in live and not job.active]:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._last_seen),
+                "jobs": len(self._jobs),
+                "active_jobs": sum(job.active for job in self._jobs.values()),
+            }
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_ingestion_worker() -> IngestionWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = IngestionWorker()
+        return _worker
@@ -0,0 +1,79 @@
+"""
+Shared runtime settings for the Annual Report Summarizer.
+Values are read from the environment at call time so .env overrides apply.
+"""
+
+import os
+from typing import Iterable
+
+_DEFAULT_CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# Model names live here so cache keys can use them without importing the
+# modules (torch, Groq SDK) that load the models.
+EMBEDDING_MODEL_NAME = "BAAI/bge-base-en-v1.5"
+QUERY_GEN_MODEL = "llama-3.3-70b-versatile"
+
+
+def cache_dir(name: str) -> str:
+    """Return (and create) a named directory under the on-disk cache root."""
+    root = os.getenv("ARS_CACHE_DIR", _DEFAULT_CACHE_ROOT)
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def touch(path: str):
+    """Mark a cached file as just used for evict_files; a vanished file is ignored."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_files(directory: str, max_bytes: int, keep: Iterable[str] = ()):
+    """
+    Delete least-recently-used files in a flat cache directory until it fits max_bytes.
+
+    Recency is the file mtime, refreshed by touch() on cache hits. Paths in
+    keep and in-progress ".tmp" writes are never removed.
+    """
+    keep = {os.path.abspath(p) for p in keep}
+    entries = []
+    for entry in os.scandir(directory):
+        if not entry.is_file() or entry.name.endswith(".tmp"):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, entry.path, stat.st_size))
+
+    total = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        total -= size
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting, falling back to default on missing/bad values."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting, falling back to default on missing/bad values."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
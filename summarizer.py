@@ -1,32 +1,38 @@
-from concurrent.futures import ThreadPoolExecutor
+from context_packing import build_context
+from metrics import span
 from prompts import section_retrieval_prompts, section_summary_prompts
 
-def summarize_section_with_llm(section_name, retriever, llm_model):
+def build_section_prompt(section_name, retriever):
     retrieval_prompt = section_retrieval_prompts.get(section_name)
     summary_instruction = section_summary_prompts.get(section_name)
 
     if not retrieval_prompt or not summary_instruction:
-        return f"Prompts for '{section_name}' not found."
+        return None
 
-    retrieved_docs = retriever.invoke(retrieval_prompt)
-    context_text = "\n\n".join(doc.page_content for doc in retrieved_docs)
+    with span("retrieve", section=section_name) as s:
+        retrieved_docs = retriever.invoke(retrieval_prompt)
+        s.set(chunks=len(retrieved_docs))
+    context_text = build_context(retrieved_docs, query=retrieval_prompt)
 
-    response = llm_model.generate_content(
-        f"Context from an Annual Report:\n{context_text}\n\nInstruction: {summary_instruction}."
-    )
+    return f"Context from an Annual Report:\n{context_text}\n\nInstruction: {summary_instruction}."
+
+def generate_summary(llm_model, prompt):
+    with span("generate", characters=len(prompt)):
+        response = llm_model.generate_content(prompt)
     return response.text
 
-def summarize_all_sections(multi_query_retriever, llm_model):
-    summaries = {}
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {
-            executor.submit(summarize_section_with_llm, section, multi_query_retriever, llm_model): section
-            for section in section_retrieval_prompts.keys()
-        }
-        for future in futures:
-            section = futures[future]
-            try:
-                summaries[section] = future.result()
-            except Exception as e:
-                summaries[section] = f"Error summarizing {section}: {e}"
-    return summaries
+def summarize_section_with_llm(section_name, retriever, llm_model):
+    prompt = build_section_prompt(section_name, retriever)
+    if prompt is None:
+        return f"Prompts for '{section_name}' not found."
+    return generate_summary(llm_model, prompt)
+
+def summarize_all_sections(multi_query_retriever, llm_model, **kwargs):
+    from scheduler import iter_section_summaries
+
+    summaries = {
+        section: summary
+        for section, summary, _ in iter_section_summaries(multi_query_retriever, llm_model, **kwargs)
+    }
+    # Keep the prompt order regardless of completion order.
+    return {section: summaries[section] for section in section_retrieval_prompts if section in summaries}
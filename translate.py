@@ -4,8 +4,29 @@ Translation helpers for the Annual Report Summarizer
 (Uses Deep Translator for Google Translate backend)
 """
 
-from typing import Dict
-from deep_translator import GoogleTranslator, exceptions as dt_exceptions
+import hashlib
+import importlib.util
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import span
+from settings import env_int
+
+# GoogleTranslator rejects payloads of 5000 characters or more.
+MAX_SEGMENT_CHARS = 4500
+CACHE_ENTRIES = 4096
+
+# deep_translator (and requests/bs4 behind it) is imported on first use so
+# importing this module stays cheap on pages that never translate.
+BACKEND_AVAILABLE = importlib.util.find_spec("deep_translator") is not None
+
+_SENTENCE_BREAK = re.compile(r"((?<=[.!?])[ \t]+|\s*\n\s*)")
+_executor = ThreadPoolExecutor(max_workers=env_int("ARS_TRANSLATE_WORKERS", 8), thread_name_prefix="translate")
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
 
 # Predefined language map
 LANGUAGES = {
@@ -32,17 +53,128 @@ def _get_language_map() -> Dict[str, str]:
     return LANGUAGES
 
 
-def translate_text(text: str, dest: str) -> str:
-    """Translate a text block using Deep Translator."""
-    if not text:
-        return ""
+def google_backend(text: str, dest: str) -> str:
+    """Default backend: one Deep Translator request."""
+    from deep_translator import GoogleTranslator
+
+    translated = GoogleTranslator(source="auto", target=dest).translate(text)
+    return translated if isinstance(translated, str) else str(translated)
+
+
+def split_text(text: str, max_len: int = MAX_SEGMENT_CHARS) -> List[Tuple[str, str]]:
+    """
+    Split text into (segment, trailing_whitespace) pairs under max_len.
+
+    Sentences on the same line are packed together; every line break ends a
+    segment, so paragraphs, list items and indentation survive translation
+    exactly as written (the backend would otherwise collapse them). A single
+    sentence longer than max_len is broken on spaces, or hard-cut as a last
+    resort. Joining each segment with its separator gives back the input.
+    """
+    parts = _SENTENCE_BREAK.split(text)
+    # parts alternates sentence, separator, sentence, ...
+    sentences = [(parts[i], parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+
+    pieces = []
+    for sentence, sep in sentences:
+        while len(sentence) > max_len:
+            cut = sentence.rfind(" ", 0, max_len)
+            cut = cut if cut > 0 else max_len
+            rest = sentence[cut:].lstrip(" ")
+            pieces.append((sentence[:cut], sentence[cut:len(sentence) - len(rest)]))
+            sentence = rest
+        pieces.append((sentence, sep))
+
+    segments, current, current_sep = [], "", ""
+    for sentence, sep in pieces:
+        if current and len(current) + len(current_sep) + len(sentence) > max_len:
+            segments.append((current, current_sep))
+            current, current_sep = "", ""
+        current = current + current_sep + sentence if current else sentence
+        current_sep = sep
+        if "\n" in sep:
+            segments.append((current, current_sep))
+            current, current_sep = "", ""
+    if current or current_sep:
+        segments.append((current, current_sep))
+    return segments
+
+
+def _cache_key(segment: str, dest: str) -> Tuple[str, str]:
+    return hashlib.sha256(segment.encode("utf-8")).hexdigest(), dest
+
 
+def _cache_get(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _cache_put(key, value: str):
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _translate_segment(segment: str, dest: str, backend: Callable[[str, str], str]) -> str:
     try:
-        translated = GoogleTranslator(source="auto", target=dest).translate(text)
-        return translated if isinstance(translated, str) else str(translated)
-    except dt_exceptions.NotValidPayload as e:
-        raise RuntimeError(f"Invalid payload: {e}")
-    except dt_exceptions.NotValidLength as e:
-        raise RuntimeError(f"Text too long: {e}")
+        return backend(segment, dest)
     except Exception as e:
+        # Matched by name so deep_translator need not be imported here.
+        kind = type(e).__name__
+        if kind == "NotValidPayload":
+            raise RuntimeError(f"Invalid payload: {e}")
+        if kind == "NotValidLength":
+            raise RuntimeError(f"Text too long: {e}")
         raise RuntimeError(f"Translation error: {e}")
+
+
+def translate_batch(
+    texts: Dict[str, str],
+    dest: str,
+    backend: Optional[Callable[[str, str], str]] = None,
+    max_len: int = MAX_SEGMENT_CHARS,
+) -> Dict[str, str]:
+    """
+    Translate several named text blocks at once.
+
+    Every block is split into segments under the backend length limit, all
+    uncached segments are translated concurrently on a bounded pool, and the
+    blocks are reassembled in order. Results are cached per (segment hash,
+    dest), so repeating a language costs nothing.
+    """
+    backend = backend or google_backend
+    split = {name: split_text(text, max_len) if text else [] for name, text in texts.items()}
+
+    translated = {}
+    pending = {}
+    for segments in split.values():
+        for segment, _ in segments:
+            if not segment.strip() or segment in translated or segment in pending:
+                continue
+            cached = _cache_get(_cache_key(segment, dest))
+            if cached is not None:
+                translated[segment] = cached
+            else:
+                pending[segment] = _executor.submit(_translate_segment, segment, dest, backend)
+
+    with span("translate", dest=dest, segments=len(pending), characters=sum(len(s) for s in pending)):
+        for segment, future in pending.items():
+            translated[segment] = future.result()
+            _cache_put(_cache_key(segment, dest), translated[segment])
+
+    return {
+        name: "".join(translated.get(segment, segment) + sep for segment, sep in segments)
+        for name, segments in split.items()
+    }
+
+
+def translate_text(text: str, dest: str, backend: Optional[Callable[[str, str], str]] = None) -> str:
+    """Translate a text block using Deep Translator."""
+    if not text:
+        return ""
+    return translate_batch({"text": text}, dest, backend=backend)["text"]
@@ -1,15 +1,400 @@
-import chromadb
-from langchain_community.vectorstores import Chroma
+import json
+import operator
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from embedding_cache import EmbeddingCache
+from metrics import span
+from settings import EMBEDDING_MODEL_NAME, env_int
 
-def create_vector_store(chunks, collection_name: str):
-    if not chunks:
-        raise ValueError("No chunks provided for vector store.")
+# "numpy" keeps each report in an in-process matrix (NumpyVectorStore);
+# "chroma" suits large multi-report corpora.
+VECTOR_BACKENDS = ("numpy", "chroma")
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Process-wide embedding model.
+
+    The model is loaded once on first use. Encode requests from any thread go
+    through one queue; a single worker drains whatever is pending and encodes
+    it as one batch, so concurrent sessions share batches instead of fighting
+    over the CPU. With a cache attached, only texts it has not seen before
+    are encoded.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = 32,
+                 max_coalesce: int = 512, max_wait: float = 0.01,
+                 cache: Optional[EmbeddingCache] = None, model: Optional[Embeddings] = None):
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_coalesce = max_coalesce
+        self.max_wait = max_wait
+        # A preloaded model (e.g. llm_stub.StubEmbeddings) skips loading model_name.
+        self._model = model
+        self._load_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._load_seconds = None
+        self._chunks_encoded = 0
+        self._encode_seconds = 0.0
+        self._batches = 0
+
+    @property
+    def model(self) -> HuggingFaceEmbeddings:
+        with self._load_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model = HuggingFaceEmbeddings(
+                    model_name=self.model_name, encode_kwargs={"batch_size": self.batch_size}
+                )
+                self._load_seconds = time.perf_counter() - start
+            return self._model
+
+    def _ensure_worker(self):
+        with self._load_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-engine", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_coalesce:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                start = time.perf_counter()
+                with span("embed", chunks=len(texts), characters=sum(len(t) for t in texts)):
+                    vectors = self.model.embed_documents(texts)
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self._chunks_encoded += len(texts)
+                self._encode_seconds += elapsed
+                self._batches += 1
+            offset = 0
+            for item_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self._encode(texts)
+
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            encoded = dict(zip(missing, self._encode(missing)))
+            self.cache.put_many(missing, [encoded[t] for t in missing])
+            vectors = [v if v is not None else encoded[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def warm_up(self):
+        """Load the model now rather than on the first request."""
+        return self.model
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model_name": self.model_name,
+                "model_load_seconds": self._load_seconds,
+                "chunks_encoded": self._chunks_encoded,
+                "encode_seconds": self._encode_seconds,
+                "batches": self._batches,
+                "chunks_per_second": (self._chunks_encoded / self._encode_seconds) if self._encode_seconds else None,
+                "cache": self.cache.stats() if self.cache is not None else None,
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            cache = EmbeddingCache(EMBEDDING_MODEL_NAME) if env_int("ARS_EMBED_CACHE", 1) else None
+            _engine = EmbeddingEngine(batch_size=env_int("ARS_EMBED_BATCH_SIZE", 32), cache=cache)
+        return _engine
+
+
+def set_embedding_engine(engine: EmbeddingEngine):
+    """Replace the process-wide engine (load tests, benchmarks)."""
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
+def vector_backend() -> str:
+    backend = os.getenv("ARS_VECTOR_BACKEND", "numpy")
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"ARS_VECTOR_BACKEND must be one of {VECTOR_BACKENDS}, got {backend!r}")
+    return backend
+
+
+_FILTER_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+
+def matches_filter(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma-style metadata filter ($and/$or and comparison operators)."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                try:
+                    if not _FILTER_OPS[op](value, operand):
+                        return False
+                except TypeError:  # e.g. None compared with a number
+                    return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Per-report vector index held in one contiguous NumPy matrix.
+
+    Embeddings are L2-normalised, so scores are cosine similarities (higher
+    is better, unlike Chroma's distances). Rows are stored as float32, or
+    float16 / int8 (with a per-row scale) to cut memory 2x / 4x. Any number
+    of queries is answered with one matrix multiply. Indexes can be saved
+    to a directory and reopened memory-mapped.
+    """
+
+    DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+    VECTORS_FILE = "vectors.npy"
+    SCALES_FILE = "scales.npy"
+    DOCUMENTS_FILE = "documents.json"
+
+    def __init__(self, embedding_function: Embeddings, dtype: Optional[str] = None,
+                 persist_directory: Optional[str] = None):
+        dtype = dtype or os.getenv("ARS_VECTOR_DTYPE", "float32")
+        if dtype not in self.DTYPES:
+            raise ValueError(f"dtype must be one of {tuple(self.DTYPES)}, got {dtype!r}")
+        self._embedding = embedding_function
+        self.dtype = dtype
+        self.persist_directory = persist_directory
+        self._vectors = np.zeros((0, 0), dtype=self.DTYPES[dtype])
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._count = 0
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._ids: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(self.DTYPES[self.dtype]), np.ones(len(vectors), dtype=np.float32)
+
+    def _append(self, rows: np.ndarray, scales: np.ndarray):
+        if self._count and self._vectors.shape[1] != rows.shape[1]:
+            raise ValueError(f"Embedding size {rows.shape[1]} does not match the index ({self._vectors.shape[1]})")
+        needed = self._count + len(rows)
+        if self._vectors.shape[1] != rows.shape[1] or needed > len(self._vectors):
+            # Grow geometrically so incremental add_documents stays linear;
+            # this also copies a read-only memory-mapped index into memory.
+            capacity = max(needed, 2 * len(self._vectors), 64)
+            vectors = np.empty((capacity, rows.shape[1]), dtype=rows.dtype)
+            scales_buffer = np.empty(capacity, dtype=np.float32)
+            if self._count:
+                vectors[:self._count] = self._vectors[:self._count]
+                scales_buffer[:self._count] = self._scales[:self._count]
+            self._vectors, self._scales = vectors, scales_buffer
+        self._vectors[self._count:needed] = rows
+        self._scales[self._count:needed] = scales
+        self._count = needed
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = [dict(m) for m in metadatas] if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        rows, scales = self._quantize(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+        with self._lock:
+            self._append(rows, scales)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._ids.extend(ids)
+        return ids
 
-    embedding_model = HuggingFaceEmbeddings(model_name="BAAI/bge-base-en-v1.5")
-    client = chromadb.Client()
+    def update_metadata(self, ids: List[str], metadatas: List[dict]):
+        with self._lock:
+            positions = {id_: i for i, id_ in enumerate(self._ids)}
+            for id_, metadata in zip(ids, metadatas):
+                self._metadatas[positions[id_]] = dict(metadata)
 
+    def similarity_search_with_score_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Top-k (document, cosine similarity) for each query embedding, in one matrix multiply."""
+        with self._lock:
+            count = self._count
+            rows, scales = self._vectors[:count], self._scales[:count]
+            texts, metadatas = self._texts[:count], self._metadatas[:count]
+        if not count or not embeddings:
+            return [[] for _ in embeddings]
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ (rows if rows.dtype == np.float32 else rows.astype(np.float32)).T
+        if self.dtype == "int8":
+            scores *= scales
+        if filter:
+            allowed = np.fromiter((matches_filter(m, filter) for m in metadatas), dtype=bool, count=count)
+            scores[:, ~allowed] = -np.inf
+
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-query_scores[candidates], kind="stable")]
+            results.append([
+                (Document(page_content=texts[i], metadata=dict(metadatas[i])), float(query_scores[i]))
+                for i in ranked if query_scores[i] != -np.inf
+            ])
+        return results
+
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                     filter: Optional[dict] = None) -> List[List[Document]]:
+        results = self.similarity_search_with_score_by_vectors(embeddings, k, filter)
+        return [[doc for doc, _ in hits] for hits in results]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vectors([self._embedding.embed_query(query)], k, filter)[0]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda similarity: (similarity + 1) / 2
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, dtype: Optional[str] = None,
+                   persist_directory: Optional[str] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, dtype=dtype, persist_directory=persist_directory)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+    def save(self, directory: Optional[str] = None):
+        """Write the index to directory (default persist_directory); documents.json is written last."""
+        directory = directory or self.persist_directory
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            count = self._count
+            arrays = {self.VECTORS_FILE: self._vectors[:count], self.SCALES_FILE: self._scales[:count]}
+            documents = {"dtype": self.dtype, "texts": self._texts[:count],
+                         "metadatas": self._metadatas[:count], "ids": self._ids[:count]}
+        for name, array in arrays.items():
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, name))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(documents, f)
+        os.replace(tmp_path, os.path.join(directory, self.DOCUMENTS_FILE))
+
+    @classmethod
+    def load(cls, directory: str, embedding_function: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        """Reopen a saved index; vectors are memory-mapped read-only unless mmap is False."""
+        with open(os.path.join(directory, cls.DOCUMENTS_FILE), "r", encoding="utf-8") as f:
+            documents = json.load(f)
+        mmap_mode = "r" if mmap else None
+        store = cls(embedding_function, dtype=documents["dtype"], persist_directory=directory)
+        store._vectors = np.load(os.path.join(directory, cls.VECTORS_FILE), mmap_mode=mmap_mode)
+        store._scales = np.load(os.path.join(directory, cls.SCALES_FILE), mmap_mode=mmap_mode)
+        store._texts, store._metadatas, store._ids = documents["texts"], documents["metadatas"], documents["ids"]
+        store._count = len(store._texts)
+        if len(store._vectors) != store._count:
+            raise ValueError(f"Corrupt vector index in {directory}")
+        return store
+
+
+def _get_client(persist_directory: str = None):
+    import chromadb
+
+    if persist_directory:
+        return chromadb.PersistentClient(path=persist_directory)
+    return chromadb.Client()
+
+
+def _reset_collection(client, collection_name: str):
     # Try to delete any existing collection with the same name. Ignore
     # failures — we'll create the collection if it's missing.
     try:
@@ -26,11 +411,87 @@ def create_vector_store(chunks, collection_name: str):
         # Ignore if creation fails because the collection already exists or
         # for other benign reasons; we'll still attempt to populate below.
         pass
+
+
+def create_vector_store(chunks, collection_name: str, persist_directory: str = None):
+    if not chunks:
+        raise ValueError("No chunks provided for vector store.")
+
+    embedding_model = get_embedding_engine()
+    if vector_backend() == "numpy":
+        # One directory per report, so collection_name is not needed here.
+        with span("index", chunks=len(chunks), characters=sum(len(c.page_content) for c in chunks)):
+            vectorstore = NumpyVectorStore.from_documents(
+                chunks, embedding_model, persist_directory=persist_directory
+            )
+            if persist_directory:
+                vectorstore.save()
+        return vectorstore
+
+    from langchain_community.vectorstores import Chroma
+
+    client = _get_client(persist_directory)
+    _reset_collection(client, collection_name)
+
     # Create the Chroma vectorstore from documents.
-    vectorstore = Chroma.from_documents(
-        documents=chunks,
-        embedding=embedding_model,
+    with span("index", chunks=len(chunks), characters=sum(len(c.page_content) for c in chunks)):
+        vectorstore = Chroma.from_documents(
+            documents=chunks,
+            embedding=embedding_model,
+            collection_name=collection_name,
+            client=client,
+        )
+    return vectorstore
+
+
+def create_empty_vector_store(collection_name: str, persist_directory: str = None):
+    """A fresh, empty collection to be filled incrementally with add_documents."""
+    if vector_backend() == "numpy":
+        return NumpyVectorStore(get_embedding_engine(), persist_directory=persist_directory)
+
+    from langchain_community.vectorstores import Chroma
+
+    client = _get_client(persist_directory)
+    _reset_collection(client, collection_name)
+    return Chroma(
         collection_name=collection_name,
+        embedding_function=get_embedding_engine(),
+        client=client,
+    )
+
+
+def persist_vector_store(vectorstore):
+    """Flush a store filled with add_documents to disk; Chroma persists as it goes."""
+    if isinstance(vectorstore, NumpyVectorStore) and vectorstore.persist_directory:
+        vectorstore.save()
+
+
+def update_chunk_metadata(vectorstore, documents):
+    """Push metadata changes of already indexed documents (matched by Document.id) to the store."""
+    if not documents:
+        return
+    ids = [doc.id for doc in documents]
+    if isinstance(vectorstore, NumpyVectorStore):
+        vectorstore.update_metadata(ids, [doc.metadata for doc in documents])
+    else:
+        # Re-embedding is served by the embedding cache.
+        vectorstore.update_documents(ids, documents)
+
+
+def load_vector_store(collection_name: str, persist_directory: str):
+    """Reopen a collection previously written by create_vector_store."""
+    embedding_model = get_embedding_engine()
+    if vector_backend() == "numpy":
+        # Raises if the index is missing so callers can rebuild it.
+        return NumpyVectorStore.load(persist_directory, embedding_model)
+
+    from langchain_community.vectorstores import Chroma
+
+    client = _get_client(persist_directory)
+    # Raises if the collection is missing so callers can rebuild it.
+    client.get_collection(name=collection_name)
+    return Chroma(
+        collection_name=collection_name,
+        embedding_function=embedding_model,
         client=client,
     )
-    return vectorstore